@@ -0,0 +1,77 @@
+import asyncio, logging, os, socket
+
+import psycopg
+
+import db
+from config import POSTGRESQL_URI, QUEUE_BATCH_SIZE, QUEUE_POLL_INTERVAL, QUEUE_LEASE_TIMEOUT
+
+# Канал LISTEN/NOTIFY, в который парсеры сообщают о новых статьях
+CHANNEL = 'notification_queue'
+# Идентификатор этого процесса в колонке claimed_by
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+
+# Функция для получения SQL, который вставляет статьи и в той же транзакции ставит новые статьи в очередь.
+# Параметры после параметров вставки: источник и массивы заголовков повторов, источников и категорий
+# ранних статей той же новости (по ним бот не отправляет повтор тем, кто уже получил раннюю статью).
+# Возвращает id и title новых статей, как обычная вставка
+def insert_and_enqueue_query(insert_query):
+    return (f"WITH inserted AS ({insert_query}), "
+            "queued AS (INSERT INTO notification_queue (source, article_id, duplicate_source, duplicate_category) "
+            "SELECT %s, inserted.id, duplicate.source, duplicate.category FROM inserted "
+            "LEFT JOIN unnest(%s::text[], %s::text[], %s::text[]) AS duplicate (title, source, category) "
+            "ON duplicate.title = inserted.title ON CONFLICT DO NOTHING) "
+            "SELECT id, title FROM inserted")
+
+
+# Асинхронная функция для оповещения экземпляров бота о новых статьях источника
+async def notify(source_name, count):
+    await db.execute("SELECT pg_notify(%s, %s)", (CHANNEL, f'{source_name}:{count}'))
+
+
+# Асинхронная функция для захвата пачки статей из очереди.
+# Строки, захваченные другими экземплярами, пропускаются (SKIP LOCKED), брошенные - забираются повторно.
+# Возвращает список (id в очереди, источник, id статьи, источник и категория ранней статьи той же новости)
+async def claim(limit=QUEUE_BATCH_SIZE):
+    return await db.fetchall(
+        "UPDATE notification_queue SET claimed_by = %s, claimed_at = now() "
+        "WHERE id IN (SELECT id FROM notification_queue "
+        "             WHERE claimed_at IS NULL OR claimed_at < now() - make_interval(secs => %s) "
+        "             ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED) "
+        "RETURNING id, source, article_id, duplicate_source, duplicate_category",
+        (WORKER_ID, QUEUE_LEASE_TIMEOUT, limit))
+
+
+# Асинхронная функция для удаления статьи из очереди после рассылки
+async def complete(queue_id):
+    await db.execute("DELETE FROM notification_queue WHERE id = %s", (queue_id,))
+
+
+# Асинхронная функция для продления захваченных строк, пока их рассылка не закончена
+async def renew_leases():
+    while True:
+        await asyncio.sleep(QUEUE_LEASE_TIMEOUT / 3)
+        try:
+            await db.execute("UPDATE notification_queue SET claimed_at = now() WHERE claimed_by = %s", (WORKER_ID,))
+        except psycopg.Error as e:
+            logging.warning("Не удалось продлить захват очереди уведомлений: %s", e)
+
+
+# Асинхронная функция для ожидания новых статей. on_notify(source_name, count) вызывается для каждого
+# оповещения, on_wakeup() - после оповещения или по истечении QUEUE_POLL_INTERVAL, если оповещений не было.
+# Отдельное соединение вне пула держит подписку LISTEN и переподключается при разрыве
+async def listen(on_notify, on_wakeup):
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(POSTGRESQL_URI, autocommit=True) as connection:
+                await connection.execute(f"LISTEN {CHANNEL}")
+                # Статьи, поставленные в очередь до подписки, забираем сразу
+                await on_wakeup()
+                while True:
+                    async for notification in connection.notifies(timeout=QUEUE_POLL_INTERVAL, stop_after=1):
+                        source_name, _, count = notification.payload.partition(':')
+                        on_notify(source_name, int(count or 0))
+                    await on_wakeup()
+        except psycopg.OperationalError as e:
+            logging.warning("Соединение для очереди уведомлений разорвано, переподключение: %s", e)
+            await asyncio.sleep(5)
@@ -0,0 +1,103 @@
+"""Замер поиска почти одинаковых статей: стоимость поиска в индексе MinHash при большом архиве.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_duplicates.py [--archive 100000] [--lookups 1000]
+
+Архив составляется из случайных текстов длиной с содержание статьи (около 600 символов) со словами
+разной частоты. Замеряются вычисление подписи, построение индекса и занимаемая им память, поиск
+для новых статей и для их повторов с изменённым заголовком или обрезанным текстом (с долей найденных
+повторов и ложных совпадений), а для сравнения - полный перебор архива.
+"""
+import argparse, os, random, statistics, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duplicates import DuplicateIndex, minhash, similarity
+
+
+# Функция для создания случайного словаря: частые слова встречаются в текстах намного чаще редких
+def make_vocabulary(size, rng):
+    letters = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+    words = [''.join(rng.choice(letters) for _ in range(rng.randint(2, 11))) for _ in range(size)]
+    weights = [1 / (rank + 1) for rank in range(size)]
+    return words, weights
+
+
+def make_article(words, weights, rng):
+    title = ' '.join(rng.choices(words, weights, k=8))
+    content = ' '.join(rng.choices(words, weights, k=110))[:600]
+    return title, content
+
+
+# Функция для правки статьи, как при перепечатке: другое слово в заголовке или обрезанный текст
+def edit_article(title, content, rng):
+    if rng.random() < 0.5:
+        title_words = title.split()
+        title_words[rng.randrange(len(title_words))] = 'изменено'
+        return ' '.join(title_words), content
+    return title, content[:rng.randint(520, 580)]
+
+
+def summarize_ms(samples):
+    ordered = sorted(samples)
+    return (f'p50 {ordered[len(ordered) // 2] * 1000:.3f} мс, p99 {ordered[int(len(ordered) * 0.99)] * 1000:.3f} мс, '
+            f'среднее {statistics.fmean(ordered) * 1000:.3f} мс')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--archive', type=int, default=100000, help='количество статей в архиве')
+    arg_parser.add_argument('--lookups', type=int, default=1000, help='количество поисков каждого вида')
+    arg_parser.add_argument('--seed', type=int, default=1)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words, weights = make_vocabulary(20000, rng)
+    archive = [make_article(words, weights, rng) for _ in range(args.archive)]
+
+    start = time.perf_counter()
+    signatures = [minhash(title, content) for title, content in archive]
+    print(f'подпись статьи: {(time.perf_counter() - start) / len(archive) * 1000:.3f} мс')
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = DuplicateIndex()
+    index.extend(('bench', article_id, signature, '') for article_id, signature in enumerate(signatures))
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'индекс на {len(index)} статей: построение {build_time:.2f} с, память {memory / 1024 / 1024:.1f} МБ')
+
+    # Новые статьи: совпадений быть не должно
+    new_times, false_matches = [], 0
+    for _ in range(args.lookups):
+        signature = minhash(*make_article(words, weights, rng))
+        start = time.perf_counter()
+        found = index.find(signature)
+        new_times.append(time.perf_counter() - start)
+        false_matches += found is not None
+    print(f'поиск новой статьи: {summarize_ms(new_times)}; ложных совпадений {false_matches} из {args.lookups}')
+
+    # Повторы статей архива: должна находиться исходная статья
+    duplicate_times, found_count = [], 0
+    for _ in range(args.lookups):
+        article_id = rng.randrange(len(archive))
+        signature = minhash(*edit_article(*archive[article_id], rng))
+        start = time.perf_counter()
+        found = index.find(signature)
+        duplicate_times.append(time.perf_counter() - start)
+        found_count += found == ('bench', article_id, '')
+    print(f'поиск повтора: {summarize_ms(duplicate_times)}; найдено {found_count} из {args.lookups}')
+
+    # Полный перебор архива для сравнения
+    scan_times = []
+    for _ in range(max(1, args.lookups // 100)):
+        signature = minhash(*make_article(words, weights, rng))
+        start = time.perf_counter()
+        max(similarity(signature, candidate) for candidate in signatures)
+        scan_times.append(time.perf_counter() - start)
+    print(f'полный перебор: {summarize_ms(scan_times)}')
+
+
+if __name__ == '__main__':
+    main()
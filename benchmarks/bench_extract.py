@@ -0,0 +1,101 @@
+"""Сравнение скорости разбора страниц: прежний путь через BeautifulSoup и извлечение на lxml из sources.py.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_extract.py [--repeat 200]
+
+Страницы берутся из benchmarks/fixtures. Перед замером проверяется, что оба способа дают одинаковый результат.
+Для запуска нужен beautifulsoup4 (сам бот его больше не использует).
+"""
+import argparse, os, sys, timeit
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sources import InformburoSource, NurSource, limit_content
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+# Прежний разбор через BeautifulSoup (полное дерево страницы и поиск по классам)
+def bs4_informburo_listing(html):
+    soup = BeautifulSoup(html, 'lxml')
+    listing = []
+    for block in soup.find_all('li', class_='uk-grid uk-grid-small uk-margin-remove-top'):
+        article_block = block.find('div', class_='uk-width-expand')
+        photo_block = block.find('div', class_='uk-width-auto')
+        try:
+            article_mark = article_block.find('span', class_='article-mark').text.strip()
+        except AttributeError:
+            article_mark = '#отсутствует'
+        listing.append({
+            'title': article_block.find('a').contents[0].strip(),
+            'photo': 'https://informburo.kz' + photo_block.find('img')['data-src'],
+            'time': article_block.find('time', class_='article-time').text.strip(),
+            'mark': article_mark,
+            'link': article_block.find('a')['href']
+        })
+    return listing
+
+
+def bs4_informburo_article(html):
+    soup = BeautifulSoup(html, 'lxml')
+    paragraphs = soup.find('div', class_='article').find_all('p')
+    return {'content': limit_content(''.join(paragraph.text for paragraph in paragraphs))}
+
+
+def bs4_nur_listing(html):
+    soup = BeautifulSoup(html, 'lxml')
+    listing = []
+    for article in soup.find_all('a', class_='article-preview-category__content'):
+        listing.append({
+            'title': article.find('h2', class_='article-preview-category__subhead').text.strip(),
+            'time': article.find('time').get('datetime'),
+            'category': article.find('span', class_='article-preview-category__text').text.strip(),
+            'link': f'{article.get("href")}'
+        })
+    return listing
+
+
+def bs4_nur_article(html):
+    soup = BeautifulSoup(html, 'lxml')
+    content_block = soup.find('div', class_='formatted-body__content--wrapper')
+    paragraphs = content_block.find_all('p', class_='align-left formatted-body__paragraph')
+    photo_block = soup.find('picture')
+    return {
+        'content': limit_content(''.join(paragraph.text for paragraph in paragraphs)),
+        'photo': photo_block.find('img')['src']
+    }
+
+
+informburo, nur = InformburoSource(), NurSource()
+CASES = [
+    ('informburo_listing', bs4_informburo_listing, informburo.parse_listing),
+    # В последней новости списка есть вложенный список <ul><li>
+    ('informburo_listing_nested', bs4_informburo_listing, informburo.parse_listing),
+    ('informburo_article', bs4_informburo_article, informburo.parse_article),
+    # Перед блоком статьи есть элемент другого тега с тем же классом
+    ('informburo_article_header', bs4_informburo_article, informburo.parse_article),
+    ('nur_listing', bs4_nur_listing, nur.parse_listing),
+    ('nur_article', bs4_nur_article, nur.parse_article),
+]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=200, help='количество разборов каждой страницы')
+    args = arg_parser.parse_args()
+
+    print(f'{"страница":<26} {"размер, КБ":>10} {"bs4, мс":>9} {"lxml, мс":>9} {"ускорение":>10}')
+    for name, old, new in CASES:
+        with open(os.path.join(FIXTURES, f'{name}.html'), encoding='utf-8') as file:
+            html = file.read()
+        if old(html) != new(html):
+            sys.exit(f'{name}: результаты разбора различаются')
+        old_time = min(timeit.repeat(lambda: old(html), number=args.repeat // 10 or 1, repeat=10)) / (args.repeat // 10 or 1)
+        new_time = min(timeit.repeat(lambda: new(html), number=args.repeat // 10 or 1, repeat=10)) / (args.repeat // 10 or 1)
+        print(f'{name:<26} {len(html.encode()) / 1024:>10.0f} {old_time * 1000:>9.2f} {new_time * 1000:>9.2f} {old_time / new_time:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""Сквозной замер цикла парсинга новостей без доступа к сети.
+
+Страницы из benchmarks/fixtures ({источник}_listing.html и {источник}_article.html) отдаются локальным
+HTTP-сервером, уведомления отправляются поддельному боту. Замеряются загрузка страниц, разбор,
+запросы к базе данных, длительность цикла, скорость рассылки уведомлений и задержка цикла событий
+(сколько ждал бы обработчик сообщения пользователя, пока идёт парсинг). Результат выводится в JSON.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_pipeline.py --dsn postgresql://localhost/newsbot_bench [--output result.json]
+
+Нужна отдельная база данных со схемой из README и миграциями: таблицы новостей и пользователей в ней очищаются.
+"""
+import argparse, asyncio, json, multiprocessing, os, statistics, sys, time
+from collections import defaultdict
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, ROOT)
+
+import config
+
+
+# Поддельный бот: принимает уведомления и возвращает сообщение с file_id фотографии, как Telegram
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_photo(self, chat_id, photo, caption=None, reply_markup=None):
+        self.sent += 1
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f'bench:{photo}')])
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+        return SimpleNamespace(photo=None)
+
+    async def send_media_group(self, chat_id, media):
+        self.sent += 1
+        return [SimpleNamespace(photo=[SimpleNamespace(file_id=f'bench:{item.media}')]) for item in media]
+
+
+# Функция для сводки замеров в миллисекундах
+def summarize(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+# Функция-обёртка, записывающая длительность каждого вызова асинхронной функции
+def timed_async(func, record):
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            record(args, time.perf_counter() - start)
+    return wrapper
+
+
+# Асинхронная функция для замера задержки цикла событий: насколько позже заданного просыпается задача.
+# Столько же ждёт готовый к выполнению обработчик сообщения пользователя
+async def probe_loop_lag(samples, interval=0.005):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+# Локальный сервер, отдающий сохранённые страницы. Адрес https://site/path превращается в {base}/site/path.
+# Сервер работает в отдельном процессе, чтобы его работа не попадала в замеры цикла событий бота
+class StubSite:
+    def __init__(self, sources, latency):
+        self.latency = latency
+        self.listings = {}
+        self.articles = {}
+        for source in sources:
+            host = urlsplit(source.listing_url).netloc
+            with open(os.path.join(FIXTURES, f'{source.name}_listing.html'), 'rb') as file:
+                self.listings[f'/{host}{urlsplit(source.listing_url).path}'] = file.read()
+            with open(os.path.join(FIXTURES, f'{source.name}_article.html'), 'rb') as file:
+                self.articles[host] = file.read()
+        self.base = None
+        self._process = None
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        parent_connection, child_connection = context.Pipe()
+        self._process = context.Process(target=self._serve, args=(child_connection,), daemon=True)
+        self._process.start()
+        self.base = f'http://127.0.0.1:{parent_connection.recv()}'
+
+    def stop(self):
+        self._process.terminate()
+        self._process.join()
+
+    def url(self, url):
+        parts = urlsplit(url)
+        return f'{self.base}/{parts.netloc}{parts.path}'
+
+    def _serve(self, connection):
+        async def serve():
+            app = web.Application()
+            app.router.add_get('/{tail:.*}', self.handle)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            connection.send(site._server.sockets[0].getsockname()[1])
+            await asyncio.Event().wait()
+        asyncio.run(serve())
+
+    async def handle(self, request):
+        await asyncio.sleep(self.latency)
+        body = self.listings.get(request.path)
+        if body is None:
+            body = self.articles.get(request.path.split('/')[1])
+        if body is None:
+            return web.Response(status=404)
+        return web.Response(body=body, content_type='text/html', charset='utf-8')
+
+
+async def run(args):
+    # Бот не подключается к Telegram, но для создания ему нужен токен правильного вида
+    config.TOKEN = '1:benchmark'
+    config.POSTGRESQL_URI = args.dsn
+    import news_bot_updated as nb
+    import parsing
+    from broadcast import Broadcaster
+    from cache import ArticleCache, SeenCache
+
+    stub = StubSite(nb.SOURCES, args.latency / 1000)
+    stub.start()
+    sources_by_host = {urlsplit(source.listing_url).netloc: source for source in nb.SOURCES}
+    sources_by_table = {source.table: source for source in nb.SOURCES}
+    samples = defaultdict(lambda: defaultdict(list))
+
+    # Подменяем загрузку страниц на локальный сервер и оборачиваем этапы цикла замерами
+    fetch_bytes, fetch_bytes_if_modified = nb.fetch_bytes, nb.fetch_bytes_if_modified
+
+    async def fetch_article_page(url):
+        return await fetch_bytes(stub.url(url))
+
+    async def fetch_listing_page(url, validators=None):
+        return await fetch_bytes_if_modified(stub.url(url), validators)
+
+    def by_url(stage):
+        return lambda args, seconds: samples[sources_by_host[urlsplit(args[0]).netloc].name][stage].append(seconds)
+
+    def by_table(stage):
+        return lambda args, seconds: samples[sources_by_table[args[0]].name][stage].append(seconds)
+
+    # Разбор замеряется вместе с передачей страницы в пул процессов и обратно
+    parse_stages = {nb.parse_listing_page: 'parse_listing', nb.parse_article_page: 'parse_article'}
+
+    def by_parse_function(args, seconds):
+        samples[args[1]][parse_stages[args[0]]].append(seconds)
+
+    nb.fetch_bytes = timed_async(fetch_article_page, by_url('fetch_article'))
+    nb.fetch_bytes_if_modified = timed_async(fetch_listing_page, by_url('fetch_listing'))
+    nb.select_existing_titles = timed_async(nb.select_existing_titles, by_table('db_select_existing'))
+    nb.insert_articles = timed_async(nb.insert_articles, by_table('db_insert'))
+    parsing.run = timed_async(parsing.run, by_parse_function)
+    parsing.start(args.workers)
+
+    fake_bot = FakeBot()
+    nb.broadcaster = Broadcaster(fake_bot, on_photo_uploaded=nb.save_photo_file_id,
+                                 rate=args.rate, chat_interval=0, stats_interval=0)
+    nb.broadcaster.start()
+    # Страницы всех статей в замере одинаковые: с поиском повторов уведомление ушло бы только о первой статье
+    nb.duplicate_index.threshold = None
+    # Подборки собираются только из статей одного цикла
+    nb.digests.threshold, nb.digests.window = args.digest_threshold, 0
+
+    await nb.db.open_pool()
+    try:
+        await nb.db.execute("TRUNCATE users CASCADE")
+        await nb.db.execute("INSERT INTO users (user_id, user_name, notifications) "
+                            "SELECT id, 'bench', TRUE FROM generate_series(1, %s) AS id", (args.users,))
+        await nb.subscribers.load()
+        results = {}
+        for source in nb.SOURCES:
+            new_articles = 0
+            sent = 0
+            send_time = 0
+            for _ in range(args.rounds):
+                # Каждый цикл начинается с пустой таблицы и кэшей, чтобы все статьи на странице были новыми
+                await nb.db.execute(f"TRUNCATE {source.table} RESTART IDENTITY")
+                nb.seen_caches[source.name] = SeenCache(config.SEEN_CACHE_SIZE)
+                nb.article_cache = ArticleCache(config.ARTICLE_CACHE_SIZE, config.ARTICLE_CACHE_TTL)
+                source.validators, source.listing_hash = {}, None
+
+                sent_before = fake_bot.sent
+                probe = asyncio.create_task(probe_loop_lag(samples[source.name]['event_loop_lag']))
+                start = time.perf_counter()
+                new_articles += await nb.parse_news(source)
+                samples[source.name]['cycle'].append(time.perf_counter() - start)
+                probe.cancel()
+                # Время рассылки: от постановки уведомлений в очередь до её опустошения
+                start = time.perf_counter()
+                await nb.digests.join()
+                await nb.broadcaster.join()
+                send_time += time.perf_counter() - start
+                sent += fake_bot.sent - sent_before
+
+            # Повторные циклы без новых статей: список не изменился и не разбирается
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                await nb.parse_news(source)
+                samples[source.name]['steady_cycle'].append(time.perf_counter() - start)
+
+            results[source.name] = {stage: summarize(values) for stage, values in samples[source.name].items()}
+            results[source.name]['new_articles'] = new_articles
+            results[source.name]['notifications'] = {
+                'sent': sent,
+                'seconds': round(send_time, 3),
+                'per_second': round(sent / send_time, 1) if send_time else None,
+            }
+    finally:
+        await nb.digests.stop()
+        await nb.broadcaster.stop()
+        parsing.shutdown()
+        await nb.close_session()
+        await nb.db.close_pool()
+        stub.stop()
+
+    return {
+        'settings': {'rounds': args.rounds, 'users': args.users, 'latency_ms': args.latency, 'rate': args.rate,
+                     'parse_workers': args.workers, 'digest_threshold': args.digest_threshold,
+                     'detail_fetch_concurrency': config.DETAIL_FETCH_CONCURRENCY},
+        'sources': results,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--dsn', required=True, help='строка подключения к отдельной базе данных для замеров')
+    arg_parser.add_argument('--rounds', type=int, default=5, help='количество циклов на источник')
+    arg_parser.add_argument('--users', type=int, default=50, help='количество подписчиков на уведомления')
+    arg_parser.add_argument('--latency', type=float, default=50, help='задержка ответа сервера, в мс')
+    arg_parser.add_argument('--rate', type=float, default=1000,
+                            help='ограничение скорости рассылки, сообщений в секунду (у Telegram около 30)')
+    arg_parser.add_argument('--workers', type=int, default=config.PARSE_WORKERS,
+                            help='количество процессов разбора страниц (0 - разбор в цикле событий)')
+    arg_parser.add_argument('--digest-threshold', type=int, default=config.DIGEST_THRESHOLD,
+                            help='отправлять подборкой, если за цикл новых статей больше этого числа')
+    arg_parser.add_argument('--output', help='файл для результата (по умолчанию - стандартный вывод)')
+    args = arg_parser.parse_args()
+
+    result = json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(result + '\n')
+    else:
+        print(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Замер полнотекстового поиска по архиву новостей (команда /search и inline-режим).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_search.py --dsn postgresql://localhost/newsbot_bench [--articles 1000000]
+
+Нужна отдельная база данных со схемой из README и миграциями: таблицы новостей в ней заполняются
+случайными статьями (около 600 символов, слова разной частоты). С --keep используются уже заполненные таблицы.
+Замеряется поиск первой и последней страницы результатов для слов разной частоты и для запросов из двух слов.
+"""
+import argparse, asyncio, itertools, os, random, statistics, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+
+import config
+
+
+# Функция для создания случайного словаря: частые слова встречаются в текстах намного чаще редких
+def make_vocabulary(size, rng):
+    letters = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+    words = [''.join(rng.choice(letters) for _ in range(rng.randint(4, 11))) for _ in range(size)]
+    # Накопленные веса: random.choices не пересчитывает их при каждом вызове
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+    return words, weights
+
+
+def summarize_ms(samples):
+    ordered = sorted(samples)
+    return (f'p50 {ordered[len(ordered) // 2] * 1000:.1f} мс, p99 {ordered[int(len(ordered) * 0.99)] * 1000:.1f} мс, '
+            f'максимум {ordered[-1] * 1000:.1f} мс')
+
+
+# Асинхронная функция для заполнения таблиц источников статьями через COPY
+async def fill(db, sources, count, words, weights, rng):
+    async with db.pool.connection() as connection:
+        for source in sources:
+            await connection.execute(f"TRUNCATE {source.table} RESTART IDENTITY")
+            columns = source.columns
+            async with connection.cursor().copy(f"COPY {source.table} ({', '.join(columns)}) FROM STDIN") as copy:
+                for number in range(count // len(sources)):
+                    article = {
+                        'title': ' '.join(rng.choices(words, cum_weights=weights, k=8)).capitalize() + f' {number}',
+                        'photo': f'https://{source.site}/photo/{number}.jpg',
+                        'time': '2026-10-18T12:00:00+05:00',
+                        source.extra_column: 'Общество',
+                        'link': f'https://{source.site}/{number}',
+                        'content': ' '.join(rng.choices(words, cum_weights=weights, k=90))[:600] + '...',
+                    }
+                    await copy.write_row([article[column] for column in columns])
+    # VACUUM вне транзакции: после загрузки помечает строки видимыми, иначе это делали бы первые запросы замера
+    async with await psycopg.AsyncConnection.connect(config.POSTGRESQL_URI, autocommit=True) as connection:
+        for source in sources:
+            await connection.execute(f"VACUUM ANALYZE {source.table}")
+
+
+async def run(args):
+    config.POSTGRESQL_URI = args.dsn
+    import db
+    from search import search_articles
+    from sources import SOURCES
+
+    rng = random.Random(args.seed)
+    words, weights = make_vocabulary(20000, rng)
+    await db.open_pool()
+    try:
+        if not args.keep:
+            start = time.perf_counter()
+            await fill(db, SOURCES, args.articles, words, weights, rng)
+            print(f'заполнение {args.articles} статей: {time.perf_counter() - start:.0f} с')
+        total = 0
+        for source in SOURCES:
+            total += (await db.fetchone(f"SELECT COUNT(*) FROM {source.table}"))[0]
+        print(f'статей в архиве: {total}')
+
+        # Слова от самых частых до редких (номер слова в словаре - место по частоте)
+        queries = {f'слово №{rank + 1}': [words[rank + shift] for shift in range(args.queries)]
+                   for rank in (0, 100, 500, 1000, 10000)}
+        queries['два частых слова'] = [f'{words[shift]} {words[shift + 1]}' for shift in range(args.queries)]
+        queries['частое и редкое'] = [f'{words[shift]} {words[15000 + shift]}' for shift in range(args.queries)]
+        # Последняя страница: всего ранжируется не больше SEARCH_CANDIDATES статей каждого источника
+        last_page = config.SEARCH_CANDIDATES * len(SOURCES) // 5
+        for name, query_list in queries.items():
+            for page_name, offset in (('1-я страница', 0), (f'{last_page}-я страница', (last_page - 1) * 5)):
+                samples, found = [], []
+                for query in query_list:
+                    start = time.perf_counter()
+                    _, matches = await search_articles(query, offset, 5)
+                    samples.append(time.perf_counter() - start)
+                    found.append(matches)
+                print(f'{name}, {page_name}: {summarize_ms(samples)}; найдено в среднем {statistics.fmean(found):.0f}')
+    finally:
+        await db.close_pool()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--dsn', required=True, help='строка подключения к отдельной базе данных для замеров')
+    arg_parser.add_argument('--articles', type=int, default=1000000, help='количество статей в архиве')
+    arg_parser.add_argument('--queries', type=int, default=50, help='количество запросов каждого вида')
+    arg_parser.add_argument('--keep', action='store_true', help='не заполнять таблицы заново')
+    arg_parser.add_argument('--seed', type=int, default=1)
+    args = arg_parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+import asyncio, logging, time
+from collections import deque
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import LinkPreviewOptions
+
+from config import (BROADCAST_WORKERS, BROADCAST_RATE_LIMIT,
+                    BROADCAST_CHAT_INTERVAL, BROADCAST_STATS_INTERVAL)
+from metrics import inc, observe
+
+
+# Заранее подготовленное уведомление о статье: подпись и клавиатура формируются один раз для всех получателей.
+# article_key передаётся обратно в on_photo_uploaded, чтобы сохранить file_id загруженной фотографии
+class Notification:
+    def __init__(self, photo, caption, reply_markup, article_key=None, photo_file_id=None, queue_id=None):
+        self.photo = photo
+        self.caption = caption
+        self.reply_markup = reply_markup
+        self.article_key = article_key
+        self.photo_file_id = photo_file_id
+        # id статьи в очереди уведомлений PostgreSQL (если уведомление взято из неё)
+        self.queue_id = queue_id
+        # Количество ещё не обработанных отправок этого уведомления
+        self.pending = 0
+        # Время создания уведомления: по нему считается отставание рассылки
+        self.created = time.monotonic()
+        # Пока фотография не загружена в Telegram, отправки ждут первую загрузку, а не загружают её параллельно
+        self.upload_lock = asyncio.Lock()
+
+    async def send(self, bot, chat_id):
+        return await bot.send_photo(chat_id,
+                                    photo=self.photo_file_id or self.photo,
+                                    caption=self.caption,
+                                    reply_markup=self.reply_markup)
+
+
+# Подборка нескольких статей одним сообщением: текст со ссылками (text) или альбом фотографий (media).
+# queue_ids - id статей в очереди уведомлений PostgreSQL, вошедших в подборку.
+# Для альбома article_keys и photo_file_ids - ключи статей и сохранённые file_id их фотографий по порядку
+# фотографий: как и у Notification, фотографии загружаются по ссылкам один раз, затем отправляются по file_id
+class Digest:
+    def __init__(self, text=None, media=None, queue_ids=(), article_keys=(), photo_file_ids=()):
+        self.text = text
+        self.media = media
+        self.queue_ids = list(queue_ids)
+        self.pending = 0
+        self.created = time.monotonic()
+        self.article_keys = list(article_keys) or [None] * len(media or ())
+        self.photo_file_ids = [None] * len(media or ())
+        # Ссылки на фотографии альбома: для повторной отправки, если Telegram не примет file_id
+        self.photos = [item.media for item in media or ()]
+        for index, file_id in enumerate(photo_file_ids):
+            if file_id is not None:
+                self.set_photo_file_id(index, file_id)
+        self.upload_lock = asyncio.Lock()
+
+    # Метод для проверки, есть ли в альбоме фотографии, ещё не загруженные в Telegram
+    def needs_upload(self):
+        return None in self.photo_file_ids
+
+    # Метод для отправки фотографии альбома с номером index по file_id вместо ссылки
+    def set_photo_file_id(self, index, file_id):
+        self.photo_file_ids[index] = file_id
+        self.media[index] = self.media[index].model_copy(update={'media': file_id})
+
+    # Метод для возврата к отправке всех фотографий альбома по ссылкам
+    def reset_photo_file_ids(self):
+        for index, photo in enumerate(self.photos):
+            self.photo_file_ids[index] = None
+            self.media[index] = self.media[index].model_copy(update={'media': photo})
+
+    async def send(self, bot, chat_id):
+        if self.media:
+            return await bot.send_media_group(chat_id, media=self.media)
+        return await bot.send_message(chat_id, self.text, parse_mode='HTML',
+                                      link_preview_options=LinkPreviewOptions(is_disabled=True))
+
+
+# Ограничитель общей скорости отправки: не больше rate сообщений в секунду
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self._next_time = 0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._next_time - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_time = max(self._next_time, time.monotonic()) + self.interval
+
+    # Метод для приостановки всех отправок (например, по требованию Telegram подождать)
+    def pause(self, seconds):
+        self._next_time = max(self._next_time, time.monotonic() + seconds)
+
+
+# Очередь рассылки уведомлений с несколькими обработчиками и соблюдением лимитов Telegram
+class Broadcaster:
+    def __init__(self, bot, on_blocked=None, on_photo_uploaded=None, on_done=None, workers=BROADCAST_WORKERS,
+                 rate=BROADCAST_RATE_LIMIT, chat_interval=BROADCAST_CHAT_INTERVAL, stats_interval=BROADCAST_STATS_INTERVAL):
+        self.bot = bot
+        # Асинхронная функция, вызываемая для пользователей, заблокировавших бота
+        self.on_blocked = on_blocked
+        # Асинхронная функция, вызываемая с article_key и file_id после первой загрузки фотографии
+        self.on_photo_uploaded = on_photo_uploaded
+        # Асинхронная функция, вызываемая с уведомлением, когда оно обработано для всех получателей
+        self.on_done = on_done
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.stats_interval = stats_interval
+        self.limiter = RateLimiter(rate)
+        # Очередь отправок для обработчиков. Её размер ограничен: пары (пользователь, уведомление)
+        # создаются из заданий рассылки по мере отправки, а не все сразу
+        self.queue = asyncio.Queue(maxsize=workers * 2)
+        # Задания рассылки: (массив chat id, список уведомлений)
+        self._jobs = deque()
+        self._jobs_ready = asyncio.Event()
+        # Количество ещё не обработанных отправок и событие их завершения
+        self._backlog = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # Время, раньше которого нельзя писать в чат (ограничение Telegram на один чат)
+        self._chat_next_time = {}
+        # Пользователи, заблокировавшие бота во время рассылки: остальные отправки им пропускаются.
+        # Очищается, когда рассылка закончена: новые задания строятся уже без отписавшихся пользователей
+        self._blocked_chats = set()
+        self._tasks = []
+        # Статистика рассылки
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+
+    # Метод для запуска обработчиков очереди
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._feed()))
+        if self.stats_interval:
+            self._tasks.append(asyncio.create_task(self._report_stats()))
+
+    # Асинхронный метод для остановки обработчиков очереди
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Метод для постановки рассылки в очередь: notifications - уведомления (Notification) или подборки (Digest).
+    # chat_ids не должен меняться до конца рассылки
+    # (например, снимок множества подписчиков)
+    def enqueue(self, chat_ids, notifications):
+        if not chat_ids or not notifications:
+            return
+        for notification in notifications:
+            notification.pending += len(chat_ids)
+        self._backlog += len(chat_ids) * len(notifications)
+        self._idle.clear()
+        self._jobs.append((chat_ids, notifications))
+        self._jobs_ready.set()
+
+    # Метод для получения количества ещё не обработанных отправок
+    def backlog(self):
+        return self._backlog
+
+    # Асинхронный метод ожидания, пока не будут обработаны все поставленные отправки
+    async def join(self):
+        await self._idle.wait()
+
+    # Метод для получения статистики рассылки
+    def stats(self):
+        return {'sent': self.sent, 'failed': self.failed, 'blocked': self.blocked, 'backlog': self._backlog}
+
+    # Асинхронный метод, передающий отправки из заданий обработчикам.
+    # Задание обходится по статьям, чтобы сообщения одному пользователю шли не подряд
+    async def _feed(self):
+        while True:
+            await self._jobs_ready.wait()
+            while self._jobs:
+                chat_ids, notifications = self._jobs.popleft()
+                for notification in notifications:
+                    for chat_id in chat_ids:
+                        await self.queue.put((chat_id, notification))
+            self._jobs_ready.clear()
+
+    async def _worker(self):
+        while True:
+            chat_id, notification = await self.queue.get()
+            try:
+                await self._send(chat_id, notification)
+            except Exception as e:
+                self.failed += 1
+                inc('broadcast_messages', result='failed')
+                logging.exception("Ошибка при отправке уведомления пользователю %s: %r", chat_id, e)
+            finally:
+                notification.pending -= 1
+                if notification.pending == 0 and self.on_done is not None:
+                    try:
+                        await self.on_done(notification)
+                    except Exception:
+                        logging.exception("Ошибка при завершении рассылки уведомления")
+                self._backlog -= 1
+                if not self._backlog:
+                    self._blocked_chats.clear()
+                    self._idle.set()
+                self.queue.task_done()
+
+    # Асинхронный метод ожидания, пока в чат снова можно писать
+    async def _wait_chat(self, chat_id):
+        now = time.monotonic()
+        next_time = self._chat_next_time.get(chat_id, 0)
+        self._chat_next_time[chat_id] = max(now, next_time) + self.chat_interval
+        if next_time > now:
+            await asyncio.sleep(next_time - now)
+        # Периодически удаляем устаревшие записи, чтобы словарь не рос бесконечно
+        if len(self._chat_next_time) > 10000:
+            self._chat_next_time = {chat: moment for chat, moment in self._chat_next_time.items() if moment > now}
+
+    async def _send(self, chat_id, notification):
+        if chat_id in self._blocked_chats:
+            return
+        await self._wait_chat(chat_id)
+        if self._needs_upload(notification):
+            async with notification.upload_lock:
+                # Пока ждали, фотографию мог загрузить другой обработчик
+                if self._needs_upload(notification):
+                    await self._send_with_retry(chat_id, notification)
+                    return
+        await self._send_with_retry(chat_id, notification)
+
+    async def _send_with_retry(self, chat_id, notification):
+        while True:
+            await self.limiter.wait()
+            # Идёт ли отправка с сохранёнными file_id фотографий (у текстовых подборок их нет)
+            uses_file_id = self._uses_file_id(notification)
+            send_start = time.monotonic()
+            try:
+                message = await notification.send(self.bot, chat_id)
+                self.sent += 1
+                observe('broadcast_send', time.monotonic() - send_start)
+                # Отставание рассылки: от появления статьи до доставки уведомления
+                observe('broadcast_delay', time.monotonic() - notification.created)
+                inc('broadcast_messages', result='sent')
+                await self._remember_file_id(notification, message)
+                return
+            except TelegramRetryAfter as e:
+                # Telegram просит подождать: приостанавливаем всю рассылку и повторяем отправку
+                logging.warning("Превышен лимит Telegram, пауза рассылки на %s с", e.retry_after)
+                self.limiter.pause(e.retry_after)
+                inc('broadcast_messages', result='retry_after')
+            except TelegramForbiddenError:
+                # Пользователь заблокировал бота - отписываем его от уведомлений один раз,
+                # даже если ему ещё предназначены другие уведомления
+                if chat_id in self._blocked_chats:
+                    return
+                self._blocked_chats.add(chat_id)
+                self.blocked += 1
+                inc('broadcast_messages', result='blocked')
+                if self.on_blocked is not None:
+                    await self.on_blocked(chat_id)
+                return
+            except TelegramBadRequest as e:
+                if not uses_file_id:
+                    self.failed += 1
+                    inc('broadcast_messages', result='failed')
+                    logging.warning("Не удалось отправить уведомление пользователю %s: %s", chat_id, e)
+                    return
+                # Telegram не принял сохранённый file_id - повторяем отправку по ссылке
+                logging.warning("Telegram не принял file_id фотографии, отправляем по ссылке: %s", e)
+                if isinstance(notification, Digest):
+                    notification.reset_photo_file_ids()
+                else:
+                    notification.photo_file_id = None
+            except TelegramAPIError as e:
+                self.failed += 1
+                inc('broadcast_messages', result='failed')
+                logging.warning("Не удалось отправить уведомление пользователю %s: %s", chat_id, e)
+                return
+
+    # Функции для проверки, нужно ли загрузить фотографии уведомления или альбома, и отправляются ли они по file_id
+    @staticmethod
+    def _needs_upload(notification):
+        if isinstance(notification, Digest):
+            return bool(notification.media) and notification.needs_upload()
+        return notification.photo_file_id is None
+
+    @staticmethod
+    def _uses_file_id(notification):
+        if isinstance(notification, Digest):
+            return any(notification.photo_file_ids)
+        return notification.photo_file_id is not None
+
+    # Асинхронный метод для запоминания file_id фотографии после первой успешной загрузки.
+    # Для альбома message - список сообщений, по одному на фотографию
+    async def _remember_file_id(self, notification, message):
+        if isinstance(notification, Digest):
+            if not notification.media or not isinstance(message, list):
+                return
+            for index, sent in enumerate(message[:len(notification.media)]):
+                if notification.photo_file_ids[index] is None and getattr(sent, 'photo', None):
+                    notification.set_photo_file_id(index, sent.photo[-1].file_id)
+                    if self.on_photo_uploaded is not None and notification.article_keys[index] is not None:
+                        await self.on_photo_uploaded(notification.article_keys[index], sent.photo[-1].file_id)
+            return
+        if notification.photo_file_id is not None or not getattr(message, 'photo', None):
+            return
+        notification.photo_file_id = message.photo[-1].file_id
+        if self.on_photo_uploaded is not None and notification.article_key is not None:
+            await self.on_photo_uploaded(notification.article_key, notification.photo_file_id)
+
+    # Асинхронный метод для периодического вывода скорости рассылки и размера очереди
+    async def _report_stats(self):
+        last_sent = self.sent
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            sent = self.sent - last_sent
+            last_sent = self.sent
+            if sent or self._backlog:
+                logging.info("Рассылка: отправлено %d (%.1f сообщений/с), в очереди %d, ошибок %d, заблокировали бота %d",
+                             sent, sent / self.stats_interval, self._backlog, self.failed, self.blocked)
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+
+
+# Ограниченное множество недавно встреченных статей с вытеснением самых давних
+class SeenCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def __contains__(self, key):
+        if key in self._items:
+            # Статья снова встретилась на сайте - продлеваем ей жизнь в кэше
+            self._items.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self):
+        return len(self._items)
+
+    # Метод для добавления статьи в кэш
+    def add(self, key):
+        self._items[key] = None
+        self._items.move_to_end(key)
+        # Вытесняем самые давние записи при превышении размера
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+# Кэш отрисованных статей с вытеснением давно не использованных записей и ограниченным временем жизни
+class ArticleCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        # Ключ -> (момент устаревания, значение)
+        self._items = OrderedDict()
+        # Счётчики попаданий и промахов
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    # Метод для получения значения из кэша (None, если его нет или оно устарело)
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    # Метод для получения значения без учёта в статистике и без продления жизни записи
+    def peek(self, key):
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            return None
+        return item[1]
+
+    # Метод для добавления значения в кэш
+    def put(self, key, value):
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    # Метод для получения статистики кэша
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
@@ -1,2 +1,85 @@
-TOKEN='YOUR TELEGRAM TOKEN'
-POSTGRESQL_URI = "YOUR POSTGRESQL URI"
+TOKEN='YOUR TELEGRAM TOKEN'
+POSTGRESQL_URI = "YOUR POSTGRESQL URI"
+
+# Настройки HTTP-клиента для парсинга сайтов
+HTTP_CONNECT_TIMEOUT = 10  # Таймаут установки соединения, в секундах
+HTTP_TOTAL_TIMEOUT = 30  # Общий таймаут запроса, в секундах
+HTTP_MAX_CONNECTIONS = 50  # Максимальное количество соединений в пуле
+HTTP_MAX_CONNECTIONS_PER_HOST = 5  # Максимальное количество одновременных запросов к одному сайту
+HTTP_KEEPALIVE_TIMEOUT = 60  # Время жизни неиспользуемого keep-alive соединения, в секундах
+DETAIL_FETCH_CONCURRENCY = 5  # Сколько страниц статей одного сайта загружается одновременно (не больше HTTP_MAX_CONNECTIONS_PER_HOST)
+SEEN_CACHE_SIZE = 1000  # Сколько последних заголовков каждого сайта хранится в памяти для отсеивания известных статей
+
+# Настройки пула соединений с PostgreSQL
+DB_POOL_MIN_SIZE = 1  # Минимальное количество открытых соединений
+DB_POOL_MAX_SIZE = 10  # Максимальное количество соединений
+DB_POOL_TIMEOUT = 30  # Сколько секунд ждать свободное соединение
+
+# Настройки рассылки уведомлений
+BROADCAST_WORKERS = 10  # Количество одновременно работающих отправителей
+BROADCAST_RATE_LIMIT = 25  # Максимум сообщений в секунду для всего бота (лимит Telegram - около 30)
+BROADCAST_CHAT_INTERVAL = 1.0  # Минимальный интервал между сообщениями в один чат, в секундах
+BROADCAST_STATS_INTERVAL = 60  # Как часто выводить статистику рассылки, в секундах
+
+# Режим отображения новостей: 'compact' - страница занимает одно сообщение, которое изменяется на месте при листании;
+# 'classic' - каждая статья отправляется отдельным сообщением
+PAGINATION_MODE = 'compact'
+
+# Настройки кэша статей для кнопок "Раскрыть"/"Скрыть"
+ARTICLE_CACHE_SIZE = 1000  # Сколько статей хранится в кэше
+ARTICLE_CACHE_TTL = 3600  # Время жизни записи кэша, в секундах
+
+# Расписание парсинга источников
+SCRAPE_INTERVAL = 60  # Интервал опроса сайта по умолчанию, в секундах
+SOURCE_INTERVALS = {}  # Интервалы для отдельных источников, например {'nur': 30}
+SCRAPE_JITTER = 10  # Случайная добавка к интервалу, в секундах, чтобы источники не опрашивались одновременно
+SCRAPE_TIMEOUT = 120  # Максимальная длительность одного цикла парсинга источника, в секундах
+# Границы адаптивного интервала опроса, в секундах: при новых статьях интервал уменьшается, в тихие периоды растёт
+SCRAPE_MIN_INTERVAL = 20
+SCRAPE_MAX_INTERVAL = 300
+SCRAPE_BACKOFF = 1.5  # Во сколько раз меняется интервал после каждого цикла
+
+# Метрики и профилирование
+METRICS_PORT = None  # Порт HTTP-сервера метрик (/metrics в формате Prometheus, /profile), None - не запускать
+METRICS_LOG_INTERVAL = 0  # Интервал вывода метрик в лог, в секундах (0 - не выводить)
+PROFILE_TOP = 30  # Количество строк в отчёте профилирования цикла парсинга
+
+# Режим запуска: 'all' - парсинг и бот в одном процессе, 'scraper' - только парсинг с публикацией статей
+# в очередь в PostgreSQL, 'bot' - только бот, рассылающий уведомления из очереди. Можно передать аргументом запуска
+RUN_MODE = 'all'
+QUEUE_BATCH_SIZE = 50  # Сколько статей из очереди забирается за один раз
+QUEUE_POLL_INTERVAL = 30  # Интервал проверки очереди, если уведомление LISTEN/NOTIFY не пришло, в секундах
+QUEUE_LEASE_TIMEOUT = 300  # Через сколько секунд без продления статья другого экземпляра бота считается брошенной
+
+# Количество процессов для разбора HTML-страниц (0 - разбирать в основном процессе)
+PARSE_WORKERS = 0
+
+# Интервал сверки подписчиков в памяти с базой данных, в секундах
+SUBSCRIBERS_RECONCILE_INTERVAL = 300
+
+# Сколько самых частых категорий источника показывать в настройке подписок по темам
+TOPICS_PER_SOURCE = 12
+
+# Подборки при большом количестве новых статей: если за цикл парсинга появилось больше DIGEST_THRESHOLD статей,
+# они собираются в течение DIGEST_WINDOW секунд и отправляются каждому пользователю одним сообщением
+# по DIGEST_MAX_ITEMS статей. None - подборки выключены, каждая статья отправляется отдельно
+DIGEST_THRESHOLD = None
+DIGEST_WINDOW = 60
+DIGEST_MAX_ITEMS = 10
+# Вид подборки: 'text' - список заголовков со ссылками, 'media_group' - альбом фотографий со списком в подписи
+# (в альбоме не больше 10 фотографий, даже если DIGEST_MAX_ITEMS больше; текст подборки - не длиннее 4096 символов)
+DIGEST_FORMAT = 'text'
+
+# Поиск почти одинаковых статей (в том числе в разных источниках): статьи, у которых доля общих
+# последовательностей слов (оценка MinHash) не меньше DUPLICATE_THRESHOLD, считаются одной новостью,
+# и тот, кому отправлялась первая статья, повтор не получает (None - поиск выключен).
+# При запуске в индекс загружаются DUPLICATE_INDEX_SIZE последних статей каждого источника
+DUPLICATE_THRESHOLD = 0.7
+DUPLICATE_INDEX_SIZE = 20000
+
+# Полнотекстовый поиск по архиву (команда /search и inline-режим): по релевантности упорядочиваются
+# SEARCH_CANDIDATES самых новых статей каждого источника, содержащих слова запроса. Чем больше это число,
+# тем дольше поиск частых слов в большом архиве (100 - до 40 страниц результатов, на миллионе статей обычно меньше 100 мс).
+# SEARCH_INLINE_RESULTS - количество результатов в одном ответе inline-режима (Telegram допускает до 50)
+SEARCH_CANDIDATES = 100
+SEARCH_INLINE_RESULTS = 20
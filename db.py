@@ -0,0 +1,54 @@
+from psycopg_pool import AsyncConnectionPool
+
+from config import POSTGRESQL_URI, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+
+# Пул асинхронных соединений с PostgreSQL (открывается при запуске бота).
+# Перед выдачей соединение проверяется, разорванные соединения пул переоткрывает сам.
+pool = AsyncConnectionPool(POSTGRESQL_URI,
+                           min_size=DB_POOL_MIN_SIZE,
+                           max_size=DB_POOL_MAX_SIZE,
+                           timeout=DB_POOL_TIMEOUT,
+                           check=AsyncConnectionPool.check_connection,
+                           open=False)
+
+
+# Асинхронная функция для открытия пула соединений
+async def open_pool():
+    await pool.open(wait=True)
+
+
+# Асинхронная функция для закрытия пула соединений
+async def close_pool():
+    await pool.close()
+
+
+# Асинхронная функция для выполнения запроса без получения результата.
+# Каждый вызов выполняется в отдельной транзакции на соединении из пула.
+async def execute(query, params=None):
+    async with pool.connection() as connection:
+        await connection.execute(query, params)
+
+
+# Асинхронная функция для получения одной строки результата запроса
+async def fetchone(query, params=None):
+    async with pool.connection() as connection:
+        cursor = await connection.execute(query, params)
+        return await cursor.fetchone()
+
+
+# Асинхронная функция для получения всех строк результата запроса
+async def fetchall(query, params=None):
+    async with pool.connection() as connection:
+        cursor = await connection.execute(query, params)
+        return await cursor.fetchall()
+
+
+# Асинхронный генератор результата запроса пачками строк по batch_size через курсор на стороне сервера:
+# весь результат в памяти не собирается
+async def stream(query, params=None, batch_size=10000):
+    async with pool.connection() as connection:
+        cursor = connection.cursor(name='stream')
+        await cursor.execute(query, params)
+        while rows := await cursor.fetchmany(batch_size):
+            yield rows
+        await cursor.close()
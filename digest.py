@@ -0,0 +1,147 @@
+import asyncio, html, logging
+from array import array
+
+from aiogram.types import InputMediaPhoto
+
+from broadcast import Digest
+from config import DIGEST_THRESHOLD, DIGEST_WINDOW, DIGEST_MAX_ITEMS, DIGEST_FORMAT
+from metrics import inc
+
+# Ограничение Telegram на длину подписи к фотографии
+CAPTION_LIMIT = 1024
+# Ограничение Telegram на количество фотографий в альбоме
+MEDIA_GROUP_LIMIT = 10
+# Ограничение Telegram на длину текста сообщения
+MESSAGE_LIMIT = 4096
+
+
+# Накопитель новых статей для подборок. Статьи попадают в него, если за цикл их больше threshold
+# или если окно уже открыто другой пачкой; через window секунд после первой пачки все накопленные
+# статьи передаются в on_flush(articles). Статья - кортеж (источник, данные статьи, id в очереди или None)
+class DigestBuffer:
+    def __init__(self, on_flush, threshold=DIGEST_THRESHOLD, window=DIGEST_WINDOW):
+        self.on_flush = on_flush
+        self.threshold = threshold
+        self.window = window
+        self._articles = []
+        self._task = None
+
+    # Метод для проверки, нужно ли отправить пачку из count статей подборкой
+    def accepts(self, count):
+        return self.threshold is not None and (self._task is not None or count > self.threshold)
+
+    def add(self, articles):
+        self._articles += articles
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_later())
+
+    # Асинхронный метод ожидания, пока накопленные статьи не будут переданы в on_flush
+    async def join(self):
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    # Асинхронный метод для отмены ожидающей подборки при остановке бота
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        articles, self._articles, self._task = self._articles, [], None
+        inc('digest_flushes')
+        inc('digest_articles', len(articles))
+        try:
+            await self.on_flush(articles)
+        except Exception:
+            logging.exception("Ошибка при отправке подборки статей")
+
+
+# Функция для разбиения получателей подборки по наборам тем: каждый пользователь получает только статьи
+# своих тем. topics - список (источник, категория, notified), где notified - тема более ранней статьи
+# о той же новости или None (см. SubscriptionIndex.interested). Подписчики на все новости (everyone)
+# получают все темы, кроме повторов, одним общим массивом. Возвращает словарь {frozenset тем: массив chat id}
+def group_audiences(topics, everyone, index):
+    extra = {}
+    for topic in topics:
+        source_name, category, notified = topic
+        for chat_id in index.interested(source_name, category, everyone, notified):
+            extra.setdefault(chat_id, set()).add(topic)
+    audiences = {frozenset(topic for topic in topics if topic[2] is None): everyone.snapshot()}
+    for chat_id, chat_topics in extra.items():
+        audiences.setdefault(frozenset(chat_topics), array('q')).append(chat_id)
+    return {chat_topics: chat_ids for chat_topics, chat_ids in audiences.items() if chat_ids}
+
+
+# Функция для подготовки подборок из списка статей (источник, данные статьи, id в очереди):
+# по DIGEST_MAX_ITEMS статей в сообщении (в альбоме - не больше MEDIA_GROUP_LIMIT).
+# Текстовая подборка, кроме того, не длиннее MESSAGE_LIMIT
+def make_digests(articles, digest_format=DIGEST_FORMAT, max_items=DIGEST_MAX_ITEMS):
+    if digest_format == 'media_group':
+        max_items = min(max_items, MEDIA_GROUP_LIMIT)
+        return [make_digest(articles[start:start + max_items], digest_format)
+                for start in range(0, len(articles), max_items)]
+    # Заголовок подборки считается с наибольшим возможным количеством статей
+    header_length = telegram_length(digest_header(max_items)) + 1
+    digests, chunk, length = [], [], header_length
+    for source, article, queue_id in articles:
+        line_length = telegram_length(plain_line(len(chunk) + 1, source, article)) + 1
+        if chunk and (len(chunk) == max_items or length + line_length > MESSAGE_LIMIT):
+            digests.append(make_digest(chunk, digest_format))
+            chunk, length = [], header_length
+            line_length = telegram_length(plain_line(1, source, article)) + 1
+        chunk.append((source, article, queue_id))
+        length += line_length
+    if chunk:
+        digests.append(make_digest(chunk, digest_format))
+    return digests
+
+
+def make_digest(articles, digest_format=DIGEST_FORMAT):
+    queue_ids = [queue_id for _, _, queue_id in articles if queue_id is not None]
+    # В альбоме должно быть не меньше двух фотографий
+    if digest_format == 'media_group' and len(articles) > 1:
+        return Digest(media=make_media_group(articles), queue_ids=queue_ids,
+                      article_keys=[(source.name, article['id']) for source, article, _ in articles],
+                      photo_file_ids=[article.get('photo_file_id') for _, article, _ in articles])
+    lines = [digest_header(len(articles)), '']
+    for number, (source, article, _) in enumerate(articles, 1):
+        lines.append(html_line(number, source, article))
+    return Digest(text='\n'.join(lines), queue_ids=queue_ids)
+
+
+# Функции для строк подборки: заголовок, строка статьи со ссылкой и она же без HTML-разметки
+# (по ней считается длина: Telegram ограничивает длину текста без разметки)
+def digest_header(count):
+    return f'📰 Новые статьи ({count}):'
+
+
+def html_line(number, source, article):
+    return f'{number}. <a href="{html.escape(article["link"])}">{html.escape(article["title"])}</a> · {source.title}'
+
+
+def plain_line(number, source, article):
+    return f'{number}. {article["title"]} · {source.title}'
+
+
+# Функция для получения длины текста так, как её считает Telegram (в единицах UTF-16)
+def telegram_length(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+# Функция для подготовки альбома: фотографии статей (по ссылкам, сохранённые file_id подставляет Digest),
+# список заголовков со ссылками - в подписи к первой
+def make_media_group(articles):
+    lines = ['📰 Новые статьи:']
+    length = telegram_length(lines[0])
+    for number, (source, article, _) in enumerate(articles, 1):
+        # Длина подписи считается без HTML-разметки
+        line_length = telegram_length(plain_line(number, source, article)) + 1
+        if length + line_length > CAPTION_LIMIT:
+            break
+        lines.append(html_line(number, source, article))
+        length += line_length
+    return [InputMediaPhoto(media=article['photo'],
+                            caption='\n'.join(lines) if number == 1 else None,
+                            parse_mode='HTML' if number == 1 else None)
+            for number, (_, article, _) in enumerate(articles, 1)]
@@ -0,0 +1,123 @@
+import hashlib, re, zlib
+from array import array
+from bisect import bisect_left
+
+from config import DUPLICATE_THRESHOLD
+
+# Слова текста для шинглов
+WORD_RE = re.compile(r'\w+')
+# Количество слов в шингле
+SHINGLE_SIZE = 3
+# Количество значений в подписи MinHash и количество значений в одной полосе индекса
+SIGNATURE_SIZE = 32
+BAND_SIZE = 4
+# Значение пустой ячейки подписи (больше любого 32-битного значения)
+_EMPTY = 1 << 32
+
+
+# Функция для получения множества шинглов текста: последовательностей из SHINGLE_SIZE слов подряд
+def shingles(text):
+    words = WORD_RE.findall(text.lower())
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+
+# Функция для вычисления подписи MinHash заголовка и содержания статьи (массив из SIGNATURE_SIZE 32-битных чисел).
+# Доля совпадающих значений подписей двух статей оценивает долю общих шинглов (коэффициент Жаккара).
+# Используется одна хэш-функция: хэш шингла определяет ячейку подписи, в ячейке хранится минимальное значение.
+# Пустые ячейки заполняются из следующей непустой, чтобы подписи коротких текстов оставались сравнимыми
+def minhash(title, content):
+    values = [_EMPTY] * SIGNATURE_SIZE
+    for shingle in shingles(f'{title} {content or ""}'):
+        hashed = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'little')
+        cell, value = hashed % SIGNATURE_SIZE, hashed >> 32
+        if value < values[cell]:
+            values[cell] = value
+    signature = array('I', bytes(4 * SIGNATURE_SIZE))
+    filled = [cell for cell, value in enumerate(values) if value != _EMPTY]
+    if not filled:
+        return signature
+    for cell in range(SIGNATURE_SIZE):
+        if values[cell] != _EMPTY:
+            signature[cell] = values[cell]
+        else:
+            offset = next((source - cell) % SIGNATURE_SIZE for source in filled + [filled[0] + SIGNATURE_SIZE]
+                          if source > cell)
+            signature[cell] = (values[(cell + offset) % SIGNATURE_SIZE] + offset * 0x9E3779B1) & 0xFFFFFFFF
+    return signature
+
+
+# Функция для оценки сходства статей по подписям: доля совпадающих значений от 0 до 1
+def similarity(first, second):
+    return sum(a == b for a, b in zip(first, second)) / SIGNATURE_SIZE
+
+
+# Индекс подписей статей для поиска почти одинаковых (сходство не меньше threshold).
+# Подпись делится на полосы по BAND_SIZE значений (LSH): статьи со сходством 0.75 совпадают хотя бы
+# в одной полосе с вероятностью 95%, несвязанные статьи - почти никогда. Для каждой полосы хранится
+# отсортированный массив (хэш полосы << 32 | номер записи), поиск - двоичным поиском по каждой полосе
+# и сравнением подписей найденных кандидатов. Запись занимает около 200 байт.
+# threshold=None - поиск выключен, find всегда возвращает None
+class DuplicateIndex:
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._signatures = array('I')
+        # Ключ записи: номер темы статьи (источник, категория) в _topics и ID статьи
+        self._topics = []
+        self._topic_numbers = {}
+        self._entry_topics = array('I')
+        self._ids = array('q')
+        self._band_entries = [array('Q') for _ in range(SIGNATURE_SIZE // BAND_SIZE)]
+
+    def __len__(self):
+        return len(self._ids)
+
+    # Метод для добавления статей: entries - список (источник, ID статьи, подпись, категория статьи)
+    def extend(self, entries):
+        start = len(self._ids)
+        for source_name, article_id, signature, category in entries:
+            topic = (source_name, category or '')
+            if topic not in self._topic_numbers:
+                self._topic_numbers[topic] = len(self._topics)
+                self._topics.append(topic)
+            self._entry_topics.append(self._topic_numbers[topic])
+            self._ids.append(article_id)
+            self._signatures.extend(signature)
+        for band, band_entries in enumerate(self._band_entries):
+            new_entries = [self._band_hash(self._signature(position), band) << 32 | position
+                           for position in range(start, len(self._ids))]
+            # Несколько записей вставляются по одной, большие пачки (загрузка при запуске) - пересортировкой
+            if len(new_entries) < 64:
+                for entry in new_entries:
+                    band_entries.insert(bisect_left(band_entries, entry), entry)
+            else:
+                band_entries.extend(new_entries)
+                band_entries[:] = array('Q', sorted(band_entries))
+
+    # Метод для поиска статьи, почти одинаковой со статьёй с подписью signature.
+    # Возвращает (источник, ID статьи, категория) самой похожей найденной статьи или None
+    def find(self, signature):
+        if self.threshold is None:
+            return None
+        candidates = set()
+        for band, band_entries in enumerate(self._band_entries):
+            band_hash = self._band_hash(signature, band)
+            index = bisect_left(band_entries, band_hash << 32)
+            while index < len(band_entries) and band_entries[index] >> 32 == band_hash:
+                candidates.add(band_entries[index] & 0xFFFFFFFF)
+                index += 1
+        best, best_similarity = None, self.threshold
+        for position in candidates:
+            candidate_similarity = similarity(signature, self._signature(position))
+            if candidate_similarity >= best_similarity:
+                best, best_similarity = position, candidate_similarity
+        if best is None:
+            return None
+        source_name, category = self._topics[self._entry_topics[best]]
+        return source_name, self._ids[best], category
+
+    def _signature(self, position):
+        return self._signatures[position * SIGNATURE_SIZE:(position + 1) * SIGNATURE_SIZE]
+
+    @staticmethod
+    def _band_hash(signature, band):
+        return zlib.crc32(signature[band * BAND_SIZE:(band + 1) * BAND_SIZE].tobytes(), band)
@@ -0,0 +1,113 @@
+from lxml import etree, html as lxml_html
+
+# Размер части HTML, передаваемой потоковому парсеру статьи за один раз
+CHUNK_SIZE = 8192
+
+
+# Функция для проверки класса элемента по правилам BeautifulSoup (class_=...):
+# значение с пробелами сравнивается со всем атрибутом, иначе ищется среди отдельных классов
+def has_class(element, value):
+    classes = element.get('class')
+    if classes is None:
+        return False
+    return classes == value or value in classes.split()
+
+
+# Функция для построения выражения XPath, выбирающего элементы с тегом tag и классом value
+def class_xpath(tag, value, relative=True):
+    prefix = './/' if relative else '//'
+    if ' ' in value:
+        return etree.XPath(f'{prefix}{tag}[@class="{value}"]')
+    return etree.XPath(f'{prefix}{tag}[contains(concat(" ", normalize-space(@class), " "), " {value} ")]')
+
+
+# Функция для разбора фрагмента HTML (например, только блока со списком новостей) в дерево lxml
+def parse_fragment(html):
+    return lxml_html.fragment_fromstring(html, create_parent='div')
+
+
+# Функция для разбора всей страницы HTML в дерево lxml
+def parse_document(html):
+    return lxml_html.document_fromstring(html)
+
+
+# Функция для получения текста элемента вместе с вложенными элементами (как .text в BeautifulSoup)
+def text_of(element):
+    return ''.join(element.itertext()) if element is not None else None
+
+
+# Функция для первого найденного элемента по выражению XPath или None
+def first(xpath, element):
+    found = xpath(element)
+    return found[0] if found else None
+
+
+# Функция для потокового разбора статьи. Собирает текст параграфов (paragraph_tag с классом paragraph_class)
+# внутри первого блока container_tag с классом container_class и прекращает разбор, как только набрано limit символов
+# и, если нужен photo_tag, найдено фото (атрибут src первого img внутри первого photo_tag).
+# Остаток страницы после этого не разбирается
+def read_article(html, container_class, limit, paragraph_class=None, paragraph_tag='p', photo_tag=None,
+                 container_tag='div'):
+    reader = _ArticleReader(container_class, limit, paragraph_class, paragraph_tag, photo_tag, container_tag)
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    for offset in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[offset:offset + CHUNK_SIZE])
+        reader.handle(parser.read_events())
+        # Текста набрано достаточно (или блок статьи закончился) и фото найдено - дальше не читаем
+        if reader.done():
+            break
+    else:
+        parser.close()
+        reader.handle(parser.read_events())
+    return reader.result()
+
+
+# Состояние потокового разбора статьи для read_article
+class _ArticleReader:
+    def __init__(self, container_class, limit, paragraph_class, paragraph_tag, photo_tag, container_tag):
+        self.container_tag = container_tag
+        self.container_class = container_class
+        self.limit = limit
+        self.paragraph_class = paragraph_class
+        self.paragraph_tag = paragraph_tag
+        self.photo_tag = photo_tag
+        self.container = None
+        self.container_closed = False
+        self.paragraphs = []
+        self.length = 0
+        self.photo = None
+        self.photo_found = photo_tag is None
+
+    def handle(self, events):
+        for event, element in events:
+            if event == 'start':
+                if (self.container is None and element.tag == self.container_tag
+                        and has_class(element, self.container_class)):
+                    self.container = element
+            elif element is self.container:
+                self.container_closed = True
+            elif self._wants_paragraph(element):
+                text = text_of(element)
+                self.paragraphs.append(text)
+                self.length += len(text)
+            elif not self.photo_found and element.tag == self.photo_tag:
+                img = element.find('.//img')
+                if img is None:
+                    raise ValueError(f'В блоке {self.photo_tag} нет изображения')
+                self.photo = img.get('src')
+                self.photo_found = True
+
+    def _wants_paragraph(self, element):
+        return (self.container is not None and not self.container_closed and self.length < self.limit
+                and element.tag == self.paragraph_tag
+                and (self.paragraph_class is None or has_class(element, self.paragraph_class)))
+
+    def done(self):
+        return (self.length >= self.limit or self.container_closed) and self.photo_found
+
+    def result(self):
+        if self.container is None:
+            raise ValueError(f'Блок статьи {self.container_tag}.{self.container_class} не найден')
+        if not self.photo_found:
+            raise ValueError(f'Фото статьи ({self.photo_tag}) не найдено')
+        return ''.join(self.paragraphs), self.photo
@@ -0,0 +1,82 @@
+import asyncio, random
+
+import aiohttp
+import fake_useragent
+
+from config import (HTTP_CONNECT_TIMEOUT, HTTP_TOTAL_TIMEOUT,
+                    HTTP_MAX_CONNECTIONS, HTTP_MAX_CONNECTIONS_PER_HOST,
+                    HTTP_KEEPALIVE_TIMEOUT)
+
+# Генератор User-Agent создаётся один раз: его инициализация довольно дорогая.
+# Выбор случайного значения тоже занимает несколько миллисекунд и блокировал бы цикл событий
+# на каждой загрузке страницы, поэтому набор значений готовится заранее
+user_agent = fake_useragent.UserAgent()
+_user_agents = [user_agent.random for _ in range(20)]
+
+
+# Функция для получения случайного User-Agent из заранее подготовленного набора
+def random_user_agent():
+    return random.choice(_user_agents)
+
+# Общая HTTP-сессия для всех парсеров (создаётся при первом запросе)
+_session = None
+
+
+# Функция для получения общей HTTP-сессии с пулом соединений
+def get_session():
+    global _session
+    if _session is None or _session.closed:
+        # Пул соединений с keep-alive и ограничением одновременных запросов к одному сайту
+        connector = aiohttp.TCPConnector(limit=HTTP_MAX_CONNECTIONS,
+                                         limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+                                         keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                                         ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=HTTP_TOTAL_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+
+# Асинхронная функция для загрузки HTML-страницы без блокировки цикла событий.
+# Возвращает байты страницы и кодировку: страница декодируется и разбирается в процессе разбора
+async def fetch_bytes(url):
+    header = {'user-agent': random_user_agent()}
+    async with get_session().get(url, headers=header) as response:
+        response.raise_for_status()
+        return await response.read(), response.get_encoding()
+
+
+# Асинхронная функция для условной загрузки страницы (If-None-Match / If-Modified-Since).
+# validators - заголовки, сохранённые после прошлой загрузки. Возвращает байты страницы, кодировку и новые validators;
+# если сервер ответил 304 Not Modified, вместо байтов и кодировки возвращается None
+async def fetch_bytes_if_modified(url, validators=None):
+    header = {'user-agent': random_user_agent(), **(validators or {})}
+    async with get_session().get(url, headers=header) as response:
+        if response.status == 304:
+            return None, None, validators
+        response.raise_for_status()
+        new_validators = {}
+        if 'ETag' in response.headers:
+            new_validators['If-None-Match'] = response.headers['ETag']
+        if 'Last-Modified' in response.headers:
+            new_validators['If-Modified-Since'] = response.headers['Last-Modified']
+        return await response.read(), response.get_encoding(), new_validators
+
+
+# Асинхронная функция для одновременного выполнения задач с ограничением их количества.
+# Ошибки не прерывают остальные задачи, а возвращаются на месте результата.
+async def gather_limited(coroutines, limit):
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines), return_exceptions=True)
+
+
+# Асинхронная функция для закрытия HTTP-сессии при завершении работы бота
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
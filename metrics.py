@@ -0,0 +1,262 @@
+import asyncio, contextvars, cProfile, io, logging, pstats, signal, time, tracemalloc
+from collections import Counter
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import web
+
+from config import METRICS_PORT, METRICS_LOG_INTERVAL, PROFILE_TOP
+
+# Количество вызовов Telegram API по методам
+api_calls = Counter()
+# Количество отображений страниц новостей и суммарное число вызовов API на них, по режимам пагинации
+page_views = Counter()
+page_view_api_calls = Counter()
+
+# Счётчики событий и замеры длительности этапов. Ключ - имя метрики и кортеж меток (имя, значение)
+counters = Counter()
+# Для замеров хранится [количество, сумма секунд, максимум]
+timings = {}
+# Показатели, значения которых вычисляются в момент чтения метрик: имя -> функция без аргументов
+gauges = {}
+
+
+# Функция для увеличения счётчика
+def inc(name, value=1, **labels):
+    counters[name, tuple(sorted(labels.items()))] += value
+
+
+# Функция для записи длительности этапа
+def observe(name, seconds, **labels):
+    timing = timings.setdefault((name, tuple(sorted(labels.items()))), [0, 0.0, 0.0])
+    timing[0] += 1
+    timing[1] += seconds
+    timing[2] = max(timing[2], seconds)
+
+
+# Контекстный менеджер для замера длительности блока кода (в том числе с await внутри)
+class timer:
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self._start, **self.labels)
+        return False
+
+
+# Функция для регистрации показателя, вычисляемого при чтении метрик
+def gauge(name, func):
+    gauges[name] = func
+
+
+# Функция для форматирования меток в формате Prometheus
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+# Функция для вывода всех метрик в текстовом формате Prometheus
+def render():
+    lines = []
+    all_counters = list(counters.items())
+    all_counters += [(('telegram_api_calls', (('method', method),)), value) for method, value in api_calls.items()]
+    all_counters += [(('page_views', (('mode', mode),)), value) for mode, value in page_views.items()]
+    all_counters += [(('page_view_api_calls', (('mode', mode),)), value) for mode, value in page_view_api_calls.items()]
+    for (name, labels), value in sorted(all_counters):
+        lines.append(f'{name}_total{_format_labels(labels)} {value}')
+    for (name, labels), (count, total, maximum) in sorted(timings.items()):
+        lines.append(f'{name}_seconds_count{_format_labels(labels)} {count}')
+        lines.append(f'{name}_seconds_sum{_format_labels(labels)} {total:.6f}')
+        lines.append(f'{name}_seconds_max{_format_labels(labels)} {maximum:.6f}')
+    for name, func in sorted(gauges.items()):
+        try:
+            lines.append(f'{name} {func()}')
+        except Exception as e:
+            logging.warning("Не удалось вычислить показатель %s: %r", name, e)
+    return '\n'.join(lines) + '\n'
+
+
+# Промежуточный слой диспетчера: длительность и ошибки каждого обработчика сообщений и нажатий кнопок
+class HandlerTimer(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object is not None else 'unknown'
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            inc('handler_errors', handler=name)
+            raise
+        finally:
+            observe('handler', time.perf_counter() - start, handler=name)
+
+
+# Источники, для следующего цикла парсинга которых запрошено профилирование: имя -> 'cpu' или 'memory'
+_profile_requests = {}
+# Запрос профилирования всех источников: режим (None - не запрошено) и источники, уже профилированные по нему
+_profile_all_mode = None
+_profile_all_done = set()
+# Идёт ли сейчас профилирование какого-либо цикла: одновременно может работать только один профилировщик
+_profiling = False
+
+
+# Функция для запроса профилирования следующего цикла парсинга источника (или всех источников, если name=None)
+def request_profile(name=None, mode='cpu'):
+    global _profile_all_mode
+    if mode not in ('cpu', 'memory'):
+        raise ValueError(f'Неизвестный режим профилирования: {mode}')
+    if name is None:
+        _profile_all_mode = mode
+        _profile_all_done.clear()
+    else:
+        _profile_requests[name] = mode
+
+
+# Функция для получения запрошенного режима профилирования цикла источника name (None - не запрошено).
+# Запрос всех источников выполняется каждым источником по одному разу
+def _take_profile_request(name):
+    mode = _profile_requests.pop(name, None)
+    if mode is None and _profile_all_mode is not None and name not in _profile_all_done:
+        _profile_all_done.add(name)
+        mode = _profile_all_mode
+    return mode
+
+
+# Контекстный менеджер для профилирования одного цикла парсинга, если оно было запрошено.
+# cProfile учитывает всё, что выполнялось в потоке за время цикла, в том числе другие задачи asyncio.
+# Пока профилируется цикл одного источника, запросы остальных ждут их следующего цикла:
+# второй cProfile в Python 3.12+ не запускается, а в более ранних версиях подменяет первый
+class profile_cycle:
+    def __init__(self, name):
+        self.name = name
+        self.mode = None
+
+    def __enter__(self):
+        global _profiling
+        if _profiling:
+            return self
+        self.mode = _take_profile_request(self.name)
+        if self.mode == 'cpu':
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError as e:
+                # Профилировщик уже запущен вне бота (например, отладчиком или coverage)
+                logging.warning("Не удалось профилировать цикл парсинга %s: %s", self.name, e)
+                self.mode = None
+        elif self.mode == 'memory':
+            self._was_tracing = tracemalloc.is_tracing()
+            if not self._was_tracing:
+                tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+        _profiling = self.mode is not None
+        return self
+
+    def __exit__(self, *exc_info):
+        global _profiling
+        if self.mode == 'cpu':
+            self._profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(self._profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            logging.info("Профиль цикла парсинга %s:\n%s", self.name, output.getvalue())
+        elif self.mode == 'memory':
+            snapshot = tracemalloc.take_snapshot()
+            if not self._was_tracing:
+                tracemalloc.stop()
+            top = snapshot.compare_to(self._snapshot, 'lineno')[:PROFILE_TOP]
+            logging.info("Выделение памяти за цикл парсинга %s:\n%s", self.name, '\n'.join(str(line) for line in top))
+        if self.mode is not None:
+            _profiling = False
+        return False
+
+
+# Обработчик HTTP-запроса метрик
+async def _metrics_handler(request):
+    return web.Response(text=render(), content_type='text/plain', charset='utf-8')
+
+
+# Обработчик HTTP-запроса профилирования: /profile?source=nur&mode=cpu
+async def _profile_handler(request):
+    name = request.query.get('source')
+    mode = request.query.get('mode', 'cpu')
+    try:
+        request_profile(name, mode)
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    return web.Response(text=f'Следующий цикл парсинга {name or "всех источников"} будет профилирован ({mode})\n')
+
+
+# Асинхронная функция для периодического вывода метрик в лог
+async def _log_metrics(interval):
+    while True:
+        await asyncio.sleep(interval)
+        logging.info("Метрики:\n%s", render())
+
+
+# Асинхронная функция для запуска HTTP-сервера метрик и периодического вывода метрик в лог.
+# Профилирование также можно запросить сигналами: SIGUSR1 - процессор, SIGUSR2 - память.
+# Возвращает функцию для остановки
+async def start(port=METRICS_PORT, log_interval=METRICS_LOG_INTERVAL):
+    runner = None
+    if port:
+        app = web.Application()
+        app.router.add_get('/metrics', _metrics_handler)
+        app.router.add_get('/profile', _profile_handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, port=port).start()
+        logging.info("Метрики доступны на порту %s (/metrics, /profile)", port)
+    log_task = asyncio.create_task(_log_metrics(log_interval)) if log_interval else None
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGUSR1, request_profile, None, 'cpu')
+        loop.add_signal_handler(signal.SIGUSR2, request_profile, None, 'memory')
+    except (AttributeError, NotImplementedError):
+        # Сигналы недоступны (например, в Windows)
+        pass
+
+    async def stop():
+        if log_task is not None:
+            log_task.cancel()
+        if runner is not None:
+            await runner.cleanup()
+    return stop
+
+
+# Счётчик вызовов API внутри текущего отображения страницы (None - вне отображения)
+_view_calls = contextvars.ContextVar('view_calls', default=None)
+
+
+# Промежуточный слой сессии бота, подсчитывающий каждый запрос к Telegram API
+class ApiCallCounter(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        api_calls[type(method).__name__] += 1
+        view_calls = _view_calls.get()
+        if view_calls is not None:
+            view_calls[0] += 1
+        return await make_request(bot, method)
+
+
+# Контекстный менеджер для подсчёта вызовов API, потраченных на одно отображение страницы
+class count_page_view:
+    def __init__(self, mode):
+        self.mode = mode
+
+    def __enter__(self):
+        self._calls = [0]
+        self._token = _view_calls.set(self._calls)
+        return self
+
+    def __exit__(self, *exc_info):
+        _view_calls.reset(self._token)
+        page_views[self.mode] += 1
+        page_view_api_calls[self.mode] += self._calls[0]
+        logging.debug("Отображение страницы (%s): %d вызовов API, в среднем %.1f",
+                      self.mode, self._calls[0], page_view_api_calls[self.mode] / page_views[self.mode])
+        return False
@@ -0,0 +1,12 @@
+-- Уникальные индексы по заголовкам новостей.
+-- Нужны для проверки новых статей одним запросом и для INSERT ... ON CONFLICT (title).
+
+-- Удаляем возможные дубликаты заголовков, оставляя самую раннюю запись
+DELETE FROM informburo_news a USING informburo_news b WHERE a.title = b.title AND a.id > b.id;
+DELETE FROM nur_news a USING nur_news b WHERE a.title = b.title AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS informburo_news_title_key ON informburo_news (title);
+CREATE UNIQUE INDEX IF NOT EXISTS nur_news_title_key ON nur_news (title);
+
+-- Частичный индекс для выборки подписчиков при рассылке уведомлений
+CREATE INDEX IF NOT EXISTS users_notifications_idx ON users (user_id) WHERE notifications;
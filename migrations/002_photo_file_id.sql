@@ -0,0 +1,4 @@
+-- Идентификатор фотографии, уже загруженной в Telegram.
+-- Повторные отправки используют его вместо ссылки, и Telegram не скачивает картинку заново.
+ALTER TABLE informburo_news ADD COLUMN IF NOT EXISTS photo_file_id TEXT;
+ALTER TABLE nur_news ADD COLUMN IF NOT EXISTS photo_file_id TEXT;
@@ -0,0 +1,13 @@
+-- Очередь уведомлений о новых статьях для раздельного запуска парсеров и бота.
+-- Парсер добавляет строку в одной транзакции со статьёй, бот забирает строки через FOR UPDATE SKIP LOCKED
+-- и удаляет их после рассылки. Строка, которую обработчик не продлевает дольше QUEUE_LEASE_TIMEOUT,
+-- снова становится доступной другим экземплярам бота.
+CREATE TABLE IF NOT EXISTS notification_queue (
+    id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL,
+    article_id INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    claimed_by TEXT,
+    claimed_at TIMESTAMPTZ,
+    UNIQUE (source, article_id)
+);
@@ -0,0 +1,12 @@
+-- Подписки пользователей на отдельные источники и категории (category у Nur, mark у Informburo).
+-- Пустая категория означает все новости источника. Общая подписка на все новости по-прежнему хранится
+-- в users.notifications
+CREATE TABLE IF NOT EXISTS subscriptions (
+    user_id BIGINT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+    source TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_id, source, category)
+);
+
+-- Индекс для загрузки подписчиков по темам при запуске бота
+CREATE INDEX IF NOT EXISTS subscriptions_topic_idx ON subscriptions (source, category, user_id);
@@ -0,0 +1,4 @@
+-- Подпись MinHash заголовка и содержания статьи для поиска почти одинаковых статей.
+-- Для уже сохранённых статей подписи вычисляются ботом при запуске
+ALTER TABLE informburo_news ADD COLUMN IF NOT EXISTS fingerprint BYTEA;
+ALTER TABLE nur_news ADD COLUMN IF NOT EXISTS fingerprint BYTEA;
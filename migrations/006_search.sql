@@ -0,0 +1,14 @@
+-- Полнотекстовый поиск по архиву новостей (команда /search и inline-режим).
+-- Вектор заголовка (вес A) и содержания (вес B) со словоформами русского языка хранится в колонке
+-- и обновляется PostgreSQL при вставке статьи. GIN-индекс находит статьи по словам без перебора таблицы
+ALTER TABLE informburo_news ADD COLUMN IF NOT EXISTS search TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(content, '')), 'B')
+) STORED;
+ALTER TABLE nur_news ADD COLUMN IF NOT EXISTS search TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(content, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS informburo_news_search_idx ON informburo_news USING GIN (search);
+CREATE INDEX IF NOT EXISTS nur_news_search_idx ON nur_news USING GIN (search);
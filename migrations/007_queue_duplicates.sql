@@ -0,0 +1,4 @@
+-- Тема (источник, категория) ранней статьи той же новости для повторов в очереди уведомлений.
+-- Повтор получают только подписчики на его тему, которым не отправлялась ранняя статья
+ALTER TABLE notification_queue ADD COLUMN IF NOT EXISTS duplicate_source TEXT;
+ALTER TABLE notification_queue ADD COLUMN IF NOT EXISTS duplicate_category TEXT;
@@ -1,560 +1,1078 @@
-import asyncio, logging, datetime
-from dateutil import parser
-from aiogram import Bot, Dispatcher, F, types
-from aiogram.filters import CommandStart
-from aiogram.types import (Message, CallbackQuery, 
-                           InlineKeyboardMarkup, InlineKeyboardButton, 
-                           ReplyKeyboardMarkup, KeyboardButton)
-
-import requests
-import fake_useragent
-from bs4 import BeautifulSoup
-
-import psycopg2
-
-from config import TOKEN, POSTGRESQL_URI
-
-# Устанавливаем соединение с базой данных PostgreSQL
-connection = psycopg2.connect(POSTGRESQL_URI)
-cursor = connection.cursor()
-
-# Асинхронная функция для добавления пользователя в базу данных
-async def add_user(user_id, user_name):
-    try:
-        # Проверяем, существует ли пользователь
-        cursor.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
-        existing_user = cursor.fetchone()
-
-        # Если пользователь не существует, вставляем его в базу данных
-        if not existing_user:
-            cursor.execute("INSERT INTO users (user_id, user_name, notifications) VALUES (%s, %s, FALSE)", (user_id, user_name))
-            connection.commit()
-    except psycopg2.Error as e:
-        print("Ошибка при добавлении пользователя в базу данных:", e)
-
-# Асинхронная функция для установки статуса уведомлений "True"
-async def update_notifications_to_true(user_id):
-    try:
-        cursor.execute("UPDATE users SET notifications = TRUE WHERE user_id = %s", (user_id,))
-        connection.commit()
-    except psycopg2.Error as e:
-        print("Ошибка при установке статуса уведомлений 'True':", e)
-
-# Асинхронная функция для установки статуса уведомлений "False"
-async def update_notifications_to_false(user_id):
-    try:
-        cursor.execute("UPDATE users SET notifications = FALSE WHERE user_id = %s", (user_id,))
-        connection.commit()
-    except psycopg2.Error as e:
-        print("Ошибка при установке статуса уведомлений 'False':", e)
-
-# Создание экземпляров бота и диспетчера
-bot = Bot(token=TOKEN)
-dp = Dispatcher()
-
-# Обработчик команды /start
-@dp.message(CommandStart())
-async def cmd_start(message: Message):
-    # Добавляем пользователя в базу данных при старте чата с ботом
-    await add_user(message.from_user.id, message.from_user.username)
-    # Отправляем приветственное сообщение и клавиатуру
-    await message.answer(f"Привет, {message.from_user.first_name}!\n"
-                         "Данный бот предназначен для просмотра новостей.\n"
-                         "Кнопка '📋 Новости' позволит приступить к просмотру новостей.\n"
-                         "Кнопка '🔔 Уведомления' позволит настроить получение уведомлений.",
-                         reply_markup=get_main_keyboard())
-
-# Функция для формирования основной клавиатуры
-def get_main_keyboard():
-    main = ReplyKeyboardMarkup(keyboard=[
-        [KeyboardButton(text='📋 Новости'), KeyboardButton(text='🔔 Уведомления')]
-    ],
-    resize_keyboard=True,
-    input_field_placeholder='Выберите пункт меню.')
-    return main
-
-# Обработчик команды "Уведомления"
-@dp.message(F.text == '🔔 Уведомления')
-async def get_notification(message: Message):
-    await message.answer('Вы хотите получать уведомления при выходе новостей?',
-                         reply_markup=get_notification_keyboard())
-
-# Функция для формирования клавиатуры запроса подписки на уведомления
-def get_notification_keyboard():
-    notification = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text='✅ Да', callback_data='subscribe'), InlineKeyboardButton(text='❌ Нет', callback_data='unsubscribe')]
-    ]) 
-    return notification
-
-# Обработчик подписки на уведомления
-@dp.callback_query(F.data == 'subscribe')
-async def subscribe(callback: CallbackQuery):
-    await callback.answer('')
-    await update_notifications_to_true(callback.from_user.id)
-    await callback.message.edit_text('✅ Теперь вы будете получать уведомления!')
-
-# Обработчик отписки от уведомлений
-@dp.callback_query(F.data == 'unsubscribe')
-async def subscribe(callback: CallbackQuery):
-    await callback.answer('')
-    await update_notifications_to_false(callback.from_user.id)
-    await callback.message.edit_text('❌ Теперь вы не будете получать уведомления!')
-
-
-# Функция для парсинга содержимого новости на сайте Informburo
-def parse_informburo_article_content(article_url):
-    url = article_url
-    header = {'user-agent': fake_useragent.UserAgent().random}
-    response = requests.get(url, headers=header).text
-
-    soup = BeautifulSoup(response, 'lxml')
-    content_block = soup.find('div', class_='article')
-    paragraphs = content_block.find_all('p')
-    
-    # Собираем содержимое параграфов в строку
-    content = ''.join(paragraph.text for paragraph in paragraphs)
-    
-    # Ограничиваем длину содержимого до 600 символов
-    content = content[:600] + '...'
-    
-    return content
-
-# Асинхронная функция для парсинга новостей с сайта Informburo
-async def parse_news_informburo():
-    url = 'https://informburo.kz/novosti'
-    header = {'user-agent': fake_useragent.UserAgent().random}
-    response = requests.get(url, headers=header).text
-
-    soup = BeautifulSoup(response, 'lxml')
-
-    # Список, в который будут добавляться данные о новых статьях
-    new_articles_data = []
-
-    # Проходим по всем блокам с новостями на сайте
-    for block in soup.find_all('li', class_='uk-grid uk-grid-small uk-margin-remove-top'):
-        article_block = block.find('div', class_='uk-width-expand')
-        photo_block = block.find('div', class_='uk-width-auto')
-        article_photo = photo_block.find('img')['data-src']
-        article_title = article_block.find('a').contents[0].strip()
-        article_time = article_block.find('time', class_='article-time').text.strip()
-        article_url = article_block.find('a')['href']
-        article_content = parse_informburo_article_content(article_url)
-        # Проверяем наличие хэштега
-        try:
-            article_mark = article_block.find('span', class_='article-mark').text.strip()
-        except AttributeError:
-            article_mark = '#отсутствует'
-
-        # Проверяем, есть ли уже такой title в базе данных
-        cursor.execute("SELECT id FROM informburo_news WHERE title = %s", (article_title,))
-        result = cursor.fetchone()
-        if not result:
-            # Создаем запись о статье в базе данных
-            cursor.execute("INSERT INTO informburo_news (title, photo, time, mark, link, content) VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
-                        (article_title, 'https://informburo.kz' + article_photo, article_time, article_mark, article_url, article_content))
-            # Получаем ID новой записи
-            new_article_id = cursor.fetchone()[0]
-
-            # Создаем словарь с данными о текущей статье
-            article_info = {
-                'ID': new_article_id,
-                'Title': article_title,
-                'Photo': 'https://informburo.kz' + article_photo,
-                'Time': article_time,
-                'Mark': article_mark,
-                'Link': article_url,
-                'Content': article_content
-            }
-            # Добавляем информацию о новой статье в список новых статей
-            new_articles_data.append(article_info)
-
-    # Если есть новые статьи, отправляем уведомления пользователям, которые подписаны на уведомления
-    if new_articles_data:
-        # Отправка уведомлений пользователям, которые подписаны на уведомления
-        cursor.execute("SELECT user_id FROM users WHERE notifications = TRUE")
-        users = cursor.fetchall()
-        for user_id in users:
-            for article_info in new_articles_data:
-                links = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text='Читать', url=article_info['Link'])]
-                ])
-                await bot.send_photo(user_id[0],
-                                    photo=article_info['Photo'],
-                                    caption=f'🔔 Новая публикация!\n📋 Заголовок: {article_info["Title"]}\n🕰 Время публикации: {article_info["Time"]}\n{article_info["Mark"]}\nСайт: informburo.kz',
-                                    reply_markup=links)
-
-    # Фиксируем изменения в базе данных
-    connection.commit()
-
-
-
-# Функция для парсинга содержимого новости на сайте Nur
-def parse_nur_article_content(article_url):
-    url = article_url
-    header = {'user-agent': fake_useragent.UserAgent().random}
-    response = requests.get(url, headers=header).text
-
-    soup = BeautifulSoup(response, 'lxml')
-    content_block = soup.find('div', class_='formatted-body__content--wrapper')
-    paragraphs = content_block.find_all('p', class_='align-left formatted-body__paragraph')
-    
-    # Собираем содержимое параграфов в строку
-    content = ''.join(paragraph.text for paragraph in paragraphs)
-    
-    # Ограничиваем длину содержимого до 600 символов
-    content = content[:600] + '...'
-    
-    return content
-
-def parse_nur_article_photo(article_url):
-    url = article_url
-    header = {'user-agent': fake_useragent.UserAgent().random}
-    response = requests.get(url, headers=header).text
-
-    soup = BeautifulSoup(response, 'lxml')
-    photo_block = soup.find('picture')
-    photo = photo_block.find('img')['src']
-
-    return photo
-
-
-# Асинхронная функция для парсинга новостей с сайта Nur
-async def parse_news_nur():
-    url = 'https://www.nur.kz/latest/'
-    header = {'user-agent': fake_useragent.UserAgent().random}
-    response = requests.get(url, headers=header).text
-
-    soup = BeautifulSoup(response, "lxml")
-
-    # Список, в который будут добавляться данные о новых статьях
-    new_articles_data = []
-
-    # Проходим по всем блокам с новостями на сайте
-    for article in soup.find_all("a", class_="article-preview-category__content"):
-        article_category = article.find("span", class_="article-preview-category__text").text.strip()
-        article_title = article.find("h2", class_="article-preview-category__subhead").text.strip()
-        article_url = f'{article.get("href")}'
-        article_date_time = article.find("time").get("datetime")
-        article_content = parse_nur_article_content(article_url)
-        article_photo = parse_nur_article_photo(article_url)
-
-        # Проверяем, есть ли уже такой title в базе данных
-        cursor.execute("SELECT id FROM nur_news WHERE title = %s", (article_title,))
-        result = cursor.fetchone()
-        if not result:
-            # Создаем запись о статье в базе данных
-            cursor.execute("INSERT INTO nur_news (title, photo, time, category, link, content) VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
-                           (article_title, article_photo, article_date_time, article_category, article_url, article_content))
-            # Получаем ID новой записи
-            new_article_id = cursor.fetchone()[0]
-
-            # Parse the time string including timezone information
-            time_datetime = parser.parse(article_date_time)
-
-            formatted_date = time_datetime.strftime('%d.%m.%Y %H:%M')
-
-            # Создаем словарь с данными о текущей статье
-            article_info = {
-                'ID': new_article_id,
-                'Title': article_title,
-                'Photo': article_photo,
-                'Date': formatted_date,
-                'Category': article_category,
-                'Link': article_url,
-                'Content': article_content
-            }
-            # Добавляем информацию о новой статье в список новых статей
-            new_articles_data.append(article_info)
-
-    # Если есть новые статьи, отправляем уведомления пользователям, которые подписаны на уведомления
-    if new_articles_data:
-        # Отправка уведомлений пользователям, которые подписаны на уведомления
-        cursor.execute("SELECT user_id FROM users WHERE notifications = TRUE")
-        users = cursor.fetchall()
-        for user_id in users:
-            for article_info in new_articles_data:
-                links = InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text='Читать', url=article_info['Link'])]
-                ])
-                await bot.send_photo(user_id[0],
-                                    photo=article_info['Photo'],
-                                    caption=f'🔔 Новая публикация!\n📋 Заголовок: {article_info["Title"]}\n🕰 Дата публикации: {article_info["Date"]}\nКатегория: {article_info["Category"]}\nСайт: nur.kz',
-                                    reply_markup=links)
-
-    # Фиксируем изменения в базе данных
-    connection.commit()
-
-
-
-# Асинхронная функция для периодического парсинга новостей
-async def parse_news_periodically():
-    while True:
-        await parse_news_informburo()
-        await parse_news_nur()
-        await asyncio.sleep(60)
-
-
-
-
-# Асинхронная функция для получения новостей Informburo
-async def get_news_informburo(message: types.Message, page_number: int = 1):
-    # Определение количества новостей на одной странице
-    items_per_page = 5  
-    start_index = (page_number - 1) * items_per_page
-    
-    # Получение новостей из базы данных
-    cursor.execute("SELECT id, title, photo, time, mark, link FROM informburo_news ORDER BY id ASC OFFSET %s LIMIT %s", (start_index, items_per_page))
-    news = cursor.fetchall()
-
-    # Отправка новостей текущей страницы пользователю
-    for article_info in news:
-        links = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text='Раскрыть', callback_data=f'open_content_informburo_{article_info[0]}')],
-            [InlineKeyboardButton(text='Читать', url=article_info[5])]
-        ])
-
-        await message.answer_photo(
-            photo=article_info[2],
-            caption=f'📋 Заголовок: {article_info[1]}\n🕰 Время публикации: {article_info[3]}\n{article_info[4]}',
-            reply_markup=links
-        )
-
-    # Определение количества страниц и создание клавиатуры пагинации
-    cursor.execute("SELECT COUNT(*) FROM informburo_news")
-    total_news_count = cursor.fetchone()[0]
-    total_pages = total_news_count // items_per_page + (1 if total_news_count % items_per_page > 0 else 0)
-    pagination_buttons = []
-    if page_number > 1:
-        pagination_buttons.append(InlineKeyboardButton(text='◀️', callback_data=f"informburo_page_{page_number - 1}"))
-    pagination_buttons.append(InlineKeyboardButton(text=f'{page_number}/{total_pages}', callback_data="current_page"))
-    if page_number < total_pages:
-        pagination_buttons.append(InlineKeyboardButton(text='▶️', callback_data=f"informburo_page_{page_number + 1}"))
-    pagination_keyboard = InlineKeyboardMarkup(inline_keyboard=[pagination_buttons])
-
-    # Отправка клавиатуры пагинации
-    await message.answer("Выберите страницу:", reply_markup=pagination_keyboard)
-
-# Обработчик раскрытия содержания новостей Informburo
-@dp.callback_query(lambda callback: callback.data.startswith('open_content_informburo_'))
-async def read_content_informburo(callback: CallbackQuery):
-    await callback.answer()
-    article_id = int(callback.data.split('_')[-1])  # Получаем ID статьи из callback data
-    
-    # Получение информации о статье из базы данных
-    cursor.execute("SELECT * FROM informburo_news WHERE id = %s", (article_id,))
-    article_info = cursor.fetchone()
-    if article_info:
-        links = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text='Скрыть', callback_data=f'close_content_informburo_{article_id}')],
-            [InlineKeyboardButton(text='Читать', url=article_info[5])]
-        ])
-        # Обновляем подпись сообщения с новым содержанием статьи
-        await bot.edit_message_caption(
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
-            caption=f'📰Содержание: {article_info[6]}',
-            reply_markup=links
-        )
-    else:
-        await bot.send_message(callback.message.chat.id, "Статья не найдена.")
-
-# Обработчик скрытия содержания новостей Informburo
-@dp.callback_query(lambda callback: callback.data.startswith('close_content_informburo_'))
-async def close_content_informburo(callback: CallbackQuery):
-    await callback.answer()
-    article_id = int(callback.data.split('_')[-1])  # Получаем ID статьи из callback data
-    
-    # Получение информации о статье из базы данных
-    cursor.execute("SELECT * FROM informburo_news WHERE id = %s", (article_id,))
-    article_info = cursor.fetchone()
-    if article_info:
-        links = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text='Раскрыть', callback_data=f'open_content_informburo_{article_id}')],
-            [InlineKeyboardButton(text='Читать', url=article_info[5])]
-        ])
-        # Обновляем подпись сообщения с изначальным видом
-        await bot.edit_message_caption(
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
-            caption=f'📋 Заголовок: {article_info[1]}\n🕰 Время публикации: {article_info[3]}\n{article_info[4]}',
-            reply_markup=links
-        )
-    else:
-        await bot.send_message(callback.message.chat.id, "Статья не найдена.")
-
-
-
-
-
-
-
-# Асинхронная функция для получения новостей Nur
-async def get_news_nur(message: types.Message, page_number: int = 1):
-    # Запрос на получение новостей из базы данных
-    cursor.execute("SELECT * FROM nur_news")
-    news = cursor.fetchall()
-
-    items_per_page = 5  # Устанавливаем количество новостей на одной странице
-    total_pages = len(news) // items_per_page + (1 if len(news) % items_per_page > 0 else 0)
-    start_index = (page_number - 1) * items_per_page
-    end_index = start_index + items_per_page
-    paginated_news = news[start_index:end_index]
-
-    for article_info in paginated_news:
-        links = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text='Раскрыть', callback_data=f'open_content_nur_{article_info[0]}')],
-            [InlineKeyboardButton(text='Читать', url=article_info[5])]
-        ])
-
-        # Parse the time string including timezone information
-        time_datetime = parser.parse(article_info[3])
-
-        formatted_date = time_datetime.strftime('%d.%m.%Y %H:%M')
-
-        await message.answer_photo(
-            photo=article_info[2],
-            caption=f'📋 Заголовок: {article_info[1]}\n🕰 Дата публикации: {formatted_date}\nКатегория: {article_info[4]}',
-            reply_markup=links
-        )
-
-    # Добавляем кнопки пагинации
-    pagination_buttons = []
-    if page_number > 1:
-        pagination_buttons.append(InlineKeyboardButton(text='◀️', callback_data=f"nur_page_{page_number - 1}"))
-    pagination_buttons.append(InlineKeyboardButton(text=f'{page_number}/{total_pages}', callback_data="current_page"))
-    if page_number < total_pages:
-        pagination_buttons.append(InlineKeyboardButton(text='▶️', callback_data=f"nur_page_{page_number + 1}"))
-    pagination_keyboard = InlineKeyboardMarkup(inline_keyboard=[pagination_buttons])
-
-    await message.answer("Выберите страницу:", reply_markup=pagination_keyboard)
-
-# Обработчик раскрытия содержания новостей Nur
-@dp.callback_query(lambda callback: callback.data.startswith('open_content_nur_'))
-async def read_content_nur(callback: CallbackQuery):
-    await callback.answer()
-    article_id = int(callback.data.split('_')[-1])  # Получаем ID статьи из callback data
-    
-    # Запрос на получение информации о статье из базы данных
-    cursor.execute("SELECT * FROM nur_news WHERE id = %s", (article_id,))
-    article_info = cursor.fetchone()
-    
-    if article_info:
-        # Parse the time string including timezone information
-        time_datetime = parser.parse(article_info[3])
-
-        formatted_date = time_datetime.strftime('%d.%m.%Y %H:%M')
-
-        links = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text='Скрыть', callback_data=f'close_content_nur_{article_id}')],
-            [InlineKeyboardButton(text='Читать', url=article_info[5])]
-        ])
-         # Обновляем подпись сообщения с новым содержанием статьи
-        await bot.edit_message_caption(
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
-            caption=f'📰Содержание: {article_info[6]}',
-            reply_markup=links
-        )
-    else:
-        await bot.send_message(callback.message.chat.id, "Статья не найдена.")
-
-# Обработчик скрытия содержания новостей Nur
-@dp.callback_query(lambda callback: callback.data.startswith('close_content_nur_'))
-async def close_content_nur(callback: CallbackQuery):
-    await callback.answer()
-    article_id = int(callback.data.split('_')[-1])  # Получаем ID статьи из callback data
-    
-    # Запрос на получение информации о статье из базы данных
-    cursor.execute("SELECT * FROM nur_news WHERE id = %s", (article_id,))
-    article_info = cursor.fetchone()
-    
-    if article_info:
-        # Parse the time string including timezone information
-        time_datetime = parser.parse(article_info[3])
-
-        formatted_date = time_datetime.strftime('%d.%m.%Y %H:%M')
-
-        links = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text='Раскрыть', callback_data=f'open_content_nur_{article_id}')],
-            [InlineKeyboardButton(text='Читать', url=article_info[5])]
-        ])
-        # Обновляем подпись сообщения с изначальным видом
-        await bot.edit_message_caption(
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
-            caption=f'📋 Заголовок: {article_info[1]}\n🕰 Дата публикации: {formatted_date}\nКатегория: {article_info[4]}',
-            reply_markup=links
-        )
-    else:
-        await bot.send_message(callback.message.chat.id, "Статья не найдена.")
-
-
-# Обработчик нажатия кнопок пагинации для нвостей Informburo
-@dp.callback_query(lambda callback_query: callback_query.data.startswith('informburo_page_'))
-async def process_informburo_page_selection(callback_query: types.CallbackQuery):
-    page_number = int(callback_query.data.split('_')[2])
-    await get_news_informburo(callback_query.message, page_number)
-    await bot.answer_callback_query(callback_query.id)
-
-# Обработчик нажатия кнопок пагинации для новостей Nur
-@dp.callback_query(lambda callback_query: callback_query.data.startswith('nur_page_'))
-async def process_nur_page_selection(callback_query: types.CallbackQuery):
-    page_number = int(callback_query.data.split('_')[2])
-    await get_news_nur(callback_query.message, page_number)
-    await bot.answer_callback_query(callback_query.id)
-
-
-# Обработчик нажатия на кнопку текущей страницы
-@dp.callback_query(lambda callback_query: callback_query.data == 'current_page')
-async def subscribe(callback: CallbackQuery):
-    await callback.answer('')
-
-
-
-# Обработчик команды "Новости"
-@dp.message(F.text == '📋 Новости')
-async def get_notification(message: Message):
-    await message.answer('Выберите источник новостей:',
-                         reply_markup=get_news_keyboard())
-    
-def get_news_keyboard():
-    news = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text='Nur', callback_data='nur_news')],
-        [InlineKeyboardButton(text='Informburo', callback_data='informburo_news')]
-    ]) 
-    return news
-
-# Обработчик нажатия на кнопку для вывода новостей Informburo
-@dp.callback_query(F.data == 'informburo_news')
-async def informburo_news_button(callback: CallbackQuery):
-    await callback.answer('')
-    await bot.delete_message(callback.message.chat.id, callback.message.message_id)
-    await get_news_informburo(callback.message)
-
-# Обработчик нажатия на кнопку для вывода новостей Nur
-@dp.callback_query(F.data == 'nur_news')
-async def nur_news_button(callback: CallbackQuery):
-    await callback.answer('')
-    await bot.delete_message(callback.message.chat.id, callback.message.message_id)
-    await get_news_nur(callback.message)
-
-
-
-
-
-
-
-# Основная асинхронная функция
-async def main():
-    # Запуск асинхронной задачи для периодического парсинга новостей
-    asyncio.create_task(parse_news_periodically())
-    # Запуск диспетчера для обработки входящих сообщений
-    await dp.start_polling(bot)
-
-# Точка входа в программу
-if __name__ == '__main__':
-    try:
-        # Запуск основной асинхронной функции
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print('Exit')
+import asyncio, logging, hashlib, time, random, sys
+from array import array
+from collections import Counter
+from aiogram import Bot, Dispatcher, F, types
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import (Message, CallbackQuery, 
+                           InlineKeyboardMarkup, InlineKeyboardButton, 
+                           ReplyKeyboardMarkup, KeyboardButton, InputMediaPhoto,
+                           InlineQuery, InlineQueryResultArticle, InputTextMessageContent)
+
+import psycopg
+
+from config import (TOKEN, DETAIL_FETCH_CONCURRENCY, SEEN_CACHE_SIZE, PAGINATION_MODE,
+                    ARTICLE_CACHE_SIZE, ARTICLE_CACHE_TTL, RUN_MODE, QUEUE_BATCH_SIZE, TOPICS_PER_SOURCE,
+                    DUPLICATE_INDEX_SIZE, SEARCH_INLINE_RESULTS)
+from http_client import fetch_bytes, fetch_bytes_if_modified, gather_limited, close_session
+from cache import SeenCache, ArticleCache
+import db
+import article_queue
+from broadcast import Broadcaster, Digest, Notification
+from digest import DigestBuffer, group_audiences, make_digests
+from duplicates import DuplicateIndex, minhash, similarity
+import metrics
+from metrics import ApiCallCounter, HandlerTimer, count_page_view, inc, profile_cycle, timer
+import parsing
+from search import normalize_query, search_articles
+from sources import SOURCES, SOURCES_BY_NAME, parse_article_page, parse_listing_page
+from subscribers import SubscriberSet, SubscriptionIndex, reconcile_periodically
+
+# Асинхронная функция для добавления пользователя в базу данных
+async def add_user(user_id, user_name):
+    try:
+        # Вставляем пользователя в базу данных, если его там ещё нет
+        await db.execute("INSERT INTO users (user_id, user_name, notifications) VALUES (%s, %s, FALSE) "
+                         "ON CONFLICT (user_id) DO NOTHING", (user_id, user_name))
+    except psycopg.Error as e:
+        print("Ошибка при добавлении пользователя в базу данных:", e)
+
+# Асинхронная функция для установки статуса уведомлений "True"
+async def update_notifications_to_true(user_id):
+    try:
+        await db.execute("UPDATE users SET notifications = TRUE WHERE user_id = %s", (user_id,))
+        subscribers.add(user_id)
+    except psycopg.Error as e:
+        print("Ошибка при установке статуса уведомлений 'True':", e)
+
+# Асинхронная функция для установки статуса уведомлений "False"
+async def update_notifications_to_false(user_id):
+    try:
+        await db.execute("UPDATE users SET notifications = FALSE WHERE user_id = %s", (user_id,))
+        subscribers.discard(user_id)
+    except psycopg.Error as e:
+        print("Ошибка при установке статуса уведомлений 'False':", e)
+
+# Асинхронная функция для подписки пользователя на тему: все новости источника (category='') или одну категорию
+async def add_subscription(user_id, source_name, category=''):
+    try:
+        await db.execute("INSERT INTO subscriptions (user_id, source, category) VALUES (%s, %s, %s) "
+                         "ON CONFLICT DO NOTHING", (user_id, source_name, category))
+        topic_index.add(user_id, source_name, category)
+    except psycopg.Error as e:
+        print("Ошибка при подписке на тему:", e)
+
+# Асинхронная функция для отписки пользователя от темы
+async def remove_subscription(user_id, source_name, category=''):
+    try:
+        await db.execute("DELETE FROM subscriptions WHERE user_id = %s AND source = %s AND category = %s",
+                         (user_id, source_name, category))
+        topic_index.discard(user_id, source_name, category)
+    except psycopg.Error as e:
+        print("Ошибка при отписке от темы:", e)
+
+# Асинхронная функция для отписки пользователя от всех уведомлений, включая подписки по темам
+async def unsubscribe_user(user_id):
+    await update_notifications_to_false(user_id)
+    try:
+        await db.execute("DELETE FROM subscriptions WHERE user_id = %s", (user_id,))
+        topic_index.discard_user(user_id)
+    except psycopg.Error as e:
+        print("Ошибка при удалении подписок по темам:", e)
+
+# Функция для получения заголовков, которые уже есть в таблице, одним запросом
+async def select_existing_titles(table, titles):
+    rows = await db.fetchall(f"SELECT title FROM {table} WHERE title = ANY(%s::text[])", (list(titles),))
+    return {title for (title,) in rows}
+
+# Функция для пакетной вставки статей одним запросом.
+# Статьи с уже существующим заголовком пропускаются, возвращается словарь {заголовок: ID} новых записей.
+# Если указан queue_source, новые статьи в той же транзакции ставятся в очередь уведомлений.
+# queue_duplicates - словарь {заголовок повтора: тема (источник, категория) ранней статьи той же новости}
+async def insert_articles(table, columns, rows, queue_source=None, queue_duplicates=None):
+    if not rows:
+        return {}
+    arrays = ', '.join('%s::bytea[]' if column == 'fingerprint' else '%s::text[]' for column in columns)
+    query = (f"INSERT INTO {table} ({', '.join(columns)}) SELECT * FROM unnest({arrays}) "
+             "ON CONFLICT (title) DO NOTHING RETURNING id, title")
+    params = [list(column) for column in zip(*rows)]
+    if queue_source is not None:
+        query = article_queue.insert_and_enqueue_query(query)
+        duplicates = queue_duplicates or {}
+        params += [queue_source, list(duplicates), [source_name for source_name, _ in duplicates.values()],
+                   [category for _, category in duplicates.values()]]
+    inserted = await db.fetchall(query, params)
+    return {title: article_id for article_id, title in inserted}
+
+# Асинхронная функция для сохранения file_id фотографии, загруженной в Telegram
+async def save_photo_file_id(article_key, file_id):
+    source_name, article_id = article_key
+    # Обновляем file_id и в кэше статей, если статья там есть
+    cached_article = article_cache.peek(article_key)
+    if cached_article is not None:
+        cached_article['photo_file_id'] = file_id
+    try:
+        await db.execute(f"UPDATE {SOURCES_BY_NAME[source_name].table} SET photo_file_id = %s WHERE id = %s", (file_id, article_id))
+    except psycopg.Error as e:
+        print("Ошибка при сохранении file_id фотографии:", e)
+
+# Создание экземпляров бота и диспетчера
+bot = Bot(token=TOKEN)
+dp = Dispatcher()
+
+# Подсчёт всех запросов бота к Telegram API
+bot.session.middleware(ApiCallCounter())
+# Замер длительности обработчиков сообщений и нажатий кнопок
+dp.message.middleware(HandlerTimer())
+dp.callback_query.middleware(HandlerTimer())
+dp.inline_query.middleware(HandlerTimer())
+
+# Асинхронная функция, вызываемая после рассылки уведомления всем получателям: статья удаляется из очереди
+async def complete_notification(notification):
+    if isinstance(notification, Digest):
+        # Статья может входить в несколько подборок для разных получателей: удаляем её после последней
+        for queue_id in notification.queue_ids:
+            digest_queue_refs[queue_id] -= 1
+            if not digest_queue_refs[queue_id]:
+                del digest_queue_refs[queue_id]
+                await article_queue.complete(queue_id)
+    elif notification.queue_id is not None:
+        await article_queue.complete(notification.queue_id)
+
+# Количество ещё не разосланных подборок, в которые входит статья из очереди уведомлений (по id в очереди)
+digest_queue_refs = Counter()
+
+# Подписчики на все уведомления и подписки по темам в памяти: рассылка не читает их из базы данных
+subscribers = SubscriberSet()
+topic_index = SubscriptionIndex()
+
+# Очередь рассылки уведомлений; пользователи, заблокировавшие бота, отписываются автоматически
+broadcaster = Broadcaster(bot, on_blocked=unsubscribe_user, on_photo_uploaded=save_photo_file_id,
+                          on_done=complete_notification)
+
+# Асинхронная функция для отправки фотографии статьи.
+# Если фотография уже загружалась в Telegram, отправляется её file_id, иначе ссылка, а полученный file_id сохраняется
+async def send_article_photo(chat_id, article_key, photo, photo_file_id, caption, reply_markup):
+    if photo_file_id:
+        try:
+            return await bot.send_photo(chat_id, photo=photo_file_id, caption=caption, reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            logging.warning("Telegram не принял file_id фотографии, отправляем по ссылке: %s", e)
+    sent_message = await bot.send_photo(chat_id, photo=photo, caption=caption, reply_markup=reply_markup)
+    await save_photo_file_id(article_key, sent_message.photo[-1].file_id)
+    return sent_message
+
+# Асинхронная функция для замены фотографии и подписи уже отправленного сообщения.
+# Как и при отправке, сначала используется сохранённый file_id, а при его отсутствии - ссылка
+async def edit_article_photo(message, article_key, photo, photo_file_id, caption, reply_markup):
+    try:
+        if photo_file_id:
+            try:
+                return await bot.edit_message_media(media=InputMediaPhoto(media=photo_file_id, caption=caption),
+                                                    chat_id=message.chat.id, message_id=message.message_id,
+                                                    reply_markup=reply_markup)
+            except TelegramBadRequest as e:
+                if 'message is not modified' in str(e):
+                    raise
+                logging.warning("Telegram не принял file_id фотографии, отправляем по ссылке: %s", e)
+        edited_message = await bot.edit_message_media(media=InputMediaPhoto(media=photo, caption=caption),
+                                                      chat_id=message.chat.id, message_id=message.message_id,
+                                                      reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        # Повторное нажатие на ту же кнопку - сообщение уже в нужном виде
+        if 'message is not modified' in str(e):
+            return None
+        raise
+    await save_photo_file_id(article_key, edited_message.photo[-1].file_id)
+    return edited_message
+
+# Обработчик команды /start
+@dp.message(CommandStart())
+async def cmd_start(message: Message):
+    # Добавляем пользователя в базу данных при старте чата с ботом
+    await add_user(message.from_user.id, message.from_user.username)
+    # Отправляем приветственное сообщение и клавиатуру
+    await message.answer(f"Привет, {message.from_user.first_name}!\n"
+                         "Данный бот предназначен для просмотра новостей.\n"
+                         "Кнопка '📋 Новости' позволит приступить к просмотру новостей.\n"
+                         "Кнопка '🔔 Уведомления' позволит настроить получение уведомлений.\n"
+                         "Команда /search <слова> найдёт статьи в архиве.",
+                         reply_markup=get_main_keyboard())
+
+# Функция для формирования основной клавиатуры
+def get_main_keyboard():
+    main = ReplyKeyboardMarkup(keyboard=[
+        [KeyboardButton(text='📋 Новости'), KeyboardButton(text='🔔 Уведомления')]
+    ],
+    resize_keyboard=True,
+    input_field_placeholder='Выберите пункт меню.')
+    return main
+
+# Обработчик команды "Уведомления"
+@dp.message(F.text == '🔔 Уведомления')
+async def get_notification(message: Message):
+    await message.answer('Вы хотите получать уведомления при выходе новостей?',
+                         reply_markup=get_notification_keyboard())
+
+# Функция для формирования клавиатуры запроса подписки на уведомления
+def get_notification_keyboard():
+    notification = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text='✅ Да', callback_data='subscribe'), InlineKeyboardButton(text='❌ Нет', callback_data='unsubscribe')],
+        [InlineKeyboardButton(text='⚙️ Выбрать источники и темы', callback_data='topics')]
+    ]) 
+    return notification
+
+# Обработчик подписки на уведомления
+@dp.callback_query(F.data == 'subscribe')
+async def subscribe(callback: CallbackQuery):
+    await callback.answer('')
+    await update_notifications_to_true(callback.from_user.id)
+    await callback.message.edit_text('✅ Теперь вы будете получать уведомления!')
+
+# Обработчик отписки от уведомлений
+@dp.callback_query(F.data == 'unsubscribe')
+async def subscribe(callback: CallbackQuery):
+    await callback.answer('')
+    await unsubscribe_user(callback.from_user.id)
+    await callback.message.edit_text('❌ Теперь вы не будете получать уведомления!')
+
+# Функция для получения короткого ключа категории для callback_data (ограничение Telegram - 64 байта)
+def topic_key(category):
+    return hashlib.blake2b(category.encode(), digest_size=6).hexdigest()
+
+# Асинхронная функция для получения категорий источника для настройки подписок:
+# самые частые среди последних статей и категории, на которые пользователь уже подписан
+async def get_source_categories(source, user_id):
+    column = source.extra_column
+    if column is None:
+        return []
+    rows = await db.fetchall(f"SELECT {column} FROM (SELECT {column} FROM {source.table} ORDER BY id DESC LIMIT 1000) recent "
+                             f"WHERE {column} IS NOT NULL AND {column} <> '' GROUP BY {column} ORDER BY COUNT(*) DESC LIMIT %s",
+                             (TOPICS_PER_SOURCE,))
+    categories = [category for (category,) in rows]
+    for source_name, category in sorted(topic_index.topics(user_id)):
+        if source_name == source.name and category and category not in categories:
+            categories.append(category)
+    return categories
+
+# Функция для формирования клавиатуры выбора источника для подписок по темам
+def get_topics_keyboard(user_id):
+    subscribed_sources = {source_name for source_name, _ in topic_index.topics(user_id)}
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f'{"✅" if source.name in subscribed_sources else "▫️"} {source.title}',
+                              callback_data=f'topics_{source.name}')] for source in SOURCES
+    ] + [[InlineKeyboardButton(text='⬅️ Назад', callback_data='notifications')]])
+
+# Функция для формирования клавиатуры подписок на категории источника
+def get_source_topics_keyboard(user_id, source, categories):
+    topics = topic_index.topics(user_id)
+    def mark(category):
+        return '✅' if (source.name, category) in topics else '▫️'
+    rows = [[InlineKeyboardButton(text=f'{mark("")} Все новости источника', callback_data=f'topic_{source.name}_all')]]
+    rows += [[InlineKeyboardButton(text=f'{mark(category)} {category}', callback_data=f'topic_{source.name}_{topic_key(category)}')]
+             for category in categories]
+    rows.append([InlineKeyboardButton(text='⬅️ К источникам', callback_data='topics')])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+# Текст над клавиатурой подписок по темам: подписка на все уведомления уже включает любые темы
+def get_topics_text(user_id):
+    if user_id in subscribers:
+        return ('Вы подписаны на все уведомления. Чтобы получать только выбранные источники и темы, '
+                'сначала отключите уведомления, затем выберите темы.')
+    return 'Выберите источники и темы, о новостях которых хотите получать уведомления:'
+
+# Обработчик возврата к вопросу о подписке на уведомления
+@dp.callback_query(F.data == 'notifications')
+async def back_to_notifications(callback: CallbackQuery):
+    await callback.answer('')
+    await callback.message.edit_text('Вы хотите получать уведомления при выходе новостей?',
+                                     reply_markup=get_notification_keyboard())
+
+# Обработчик кнопки выбора источников и тем
+@dp.callback_query(F.data == 'topics')
+async def choose_topic_source(callback: CallbackQuery):
+    await callback.answer('')
+    await callback.message.edit_text(get_topics_text(callback.from_user.id),
+                                     reply_markup=get_topics_keyboard(callback.from_user.id))
+
+# Обработчик выбора источника: список его категорий с отметками подписок
+@dp.callback_query(lambda callback: callback.data.startswith('topics_')
+                                    and callback.data.removeprefix('topics_') in SOURCES_BY_NAME)
+async def choose_source_topics(callback: CallbackQuery):
+    await callback.answer('')
+    source = SOURCES_BY_NAME[callback.data.removeprefix('topics_')]
+    categories = await get_source_categories(source, callback.from_user.id)
+    await callback.message.edit_text(f'{get_topics_text(callback.from_user.id)}\n\n{source.title}',
+                                     reply_markup=get_source_topics_keyboard(callback.from_user.id, source, categories))
+
+# Обработчик нажатия на тему: подписка, если пользователь не подписан, иначе отписка
+@dp.callback_query(lambda callback: callback.data.startswith('topic_')
+                                    and callback.data.split('_')[1] in SOURCES_BY_NAME)
+async def toggle_topic(callback: CallbackQuery):
+    _, source_name, key = callback.data.split('_', 2)
+    source = SOURCES_BY_NAME[source_name]
+    user_id = callback.from_user.id
+    categories = await get_source_categories(source, user_id)
+    if key == 'all':
+        category = ''
+    else:
+        category = next((category for category in categories if topic_key(category) == key), None)
+        if category is None:
+            await callback.answer('Тема не найдена, откройте список тем заново')
+            return
+    await callback.answer('')
+    if (source.name, category) in topic_index.topics(user_id):
+        await remove_subscription(user_id, source.name, category)
+    else:
+        await add_subscription(user_id, source.name, category)
+    await callback.message.edit_reply_markup(reply_markup=get_source_topics_keyboard(user_id, source, categories))
+
+
+# Кэш отрисованных статей по ключу (источник, ID): кнопки "Раскрыть"/"Скрыть" обслуживаются без запросов к базе данных
+article_cache = ArticleCache(ARTICLE_CACHE_SIZE, ARTICLE_CACHE_TTL)
+
+# Функция для формирования клавиатуры статьи: раскрыть/скрыть содержание и ссылка на сайт
+def get_article_keyboard(source, article_id, link, opened):
+    if opened:
+        toggle = InlineKeyboardButton(text='Скрыть', callback_data=f'close_content_{source.name}_{article_id}')
+    else:
+        toggle = InlineKeyboardButton(text='Раскрыть', callback_data=f'open_content_{source.name}_{article_id}')
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [toggle],
+        [InlineKeyboardButton(text='Читать', url=link)]
+    ])
+
+# Функция для отрисовки статьи: подписи и клавиатуры для раскрытого и скрытого вида
+def render_article(source, article):
+    return {
+        'open': (f'📰Содержание: {article["content"]}', get_article_keyboard(source, article['id'], article['link'], True)),
+        'closed': (source.format_caption(article), get_article_keyboard(source, article['id'], article['link'], False)),
+        'title': article['title'],
+        'photo': article['photo'],
+        'link': article['link'],
+        'content': article['content'],
+        'photo_file_id': article.get('photo_file_id')
+    }
+
+# Асинхронная функция для получения отрисованной статьи: из кэша, а при промахе - из базы данных с сохранением в кэш
+async def get_article(source, article_id):
+    article = article_cache.get((source.name, article_id))
+    if article is None:
+        columns = ('id',) + source.columns + ('photo_file_id',)
+        article_info = await db.fetchone(f"SELECT {', '.join(columns)} FROM {source.table} WHERE id = %s", (article_id,))
+        if article_info is None:
+            return None
+        article = render_article(source, dict(zip(columns, article_info)))
+        article_cache.put((source.name, article_id), article)
+    return article
+
+
+# Кэши заголовков уже известных статей: позволяют не загружать страницы статей, которые уже есть в базе
+seen_caches = {source.name: SeenCache(SEEN_CACHE_SIZE) for source in SOURCES}
+
+# Количество статей каждого источника: считается один раз при запуске и пополняется парсером
+news_counts = {source.name: 0 for source in SOURCES}
+
+# Асинхронная функция для подсчета статей в таблицах при запуске бота
+async def warm_news_counts():
+    for source in SOURCES:
+        news_counts[source.name] = (await db.fetchone(f"SELECT COUNT(*) FROM {source.table}"))[0]
+
+# Функция для заполнения кэшей заголовков последними статьями из базы данных
+async def warm_seen_caches():
+    for source in SOURCES:
+        rows = await db.fetchall(f"SELECT title FROM {source.table} ORDER BY id DESC LIMIT %s", (SEEN_CACHE_SIZE,))
+        # Добавляем от старых к новым, чтобы первыми вытеснялись самые старые статьи
+        for (title,) in reversed(rows):
+            seen_caches[source.name].add(title)
+
+
+# Индекс отпечатков статей всех источников для поиска почти одинаковых статей
+duplicate_index = DuplicateIndex()
+duplicate_lock = asyncio.Lock()
+
+# Асинхронная функция для заполнения индекса отпечатков последними статьями из базы данных.
+# Отпечатки статей, сохранённых до появления колонки fingerprint, вычисляются и сохраняются
+async def warm_duplicate_index():
+    for source in SOURCES:
+        entries, missing = [], []
+        async for rows in db.stream(f"SELECT id, fingerprint, CASE WHEN fingerprint IS NULL THEN title END, "
+                                    f"CASE WHEN fingerprint IS NULL THEN content END, {source.extra_column} "
+                                    f"FROM {source.table} ORDER BY id DESC LIMIT %s", (DUPLICATE_INDEX_SIZE,)):
+            for article_id, fingerprint, title, content, category in rows:
+                if fingerprint is None:
+                    fingerprint = minhash(title, content).tobytes()
+                    missing.append((article_id, fingerprint))
+                entries.append((source.name, article_id, array('I', fingerprint), category))
+            # Вычисление отпечатков занимает заметное время - отдаём управление циклу событий между пачками
+            await asyncio.sleep(0)
+        if missing:
+            await db.execute(f"UPDATE {source.table} SET fingerprint = missing.fingerprint "
+                             "FROM unnest(%s::int[], %s::bytea[]) AS missing (id, fingerprint) "
+                             f"WHERE {source.table}.id = missing.id",
+                             ([article_id for article_id, _ in missing], [fingerprint for _, fingerprint in missing]))
+            logging.info("Вычислены отпечатки статей %s: %d", source.name, len(missing))
+        # Старые статьи добавляются первыми: повтор сопоставляется с самой ранней статьёй новости
+        duplicate_index.extend(reversed(entries))
+
+# Функция для поиска почти одинаковых статей в индексе и внутри пачки статей источника.
+# Возвращает словарь {заголовок: (источник, ID статьи, категория статьи, повтором которой она является)};
+# у повтора внутри пачки вместо ID - заголовок первой статьи, она ещё не сохранена
+def find_duplicates(source, articles):
+    duplicates = {}
+    if duplicate_index.threshold is None:
+        return duplicates
+    for number, article in enumerate(articles):
+        duplicate = duplicate_index.find(article['fingerprint'])
+        if duplicate is None:
+            duplicate = next(((source.name, earlier['title'], earlier.get(source.extra_column) or '')
+                              for earlier in articles[:number]
+                              if earlier['title'] not in duplicates
+                              and similarity(earlier['fingerprint'], article['fingerprint']) >= duplicate_index.threshold),
+                             None)
+        if duplicate is not None:
+            duplicates[article['title']] = duplicate
+    return duplicates
+
+
+# Асинхронная функция для загрузки и разбора страницы статьи
+async def fetch_article(source, article):
+    with timer('scrape_fetch', source=source.name, page='article'):
+        body, encoding = await fetch_bytes(article['link'])
+    # Разбор выполняется в пуле процессов, чтобы не задерживать обработку сообщений пользователей
+    with timer('scrape_parse', source=source.name, page='article'):
+        details = await parsing.run(parse_article_page, source.name, body, encoding)
+        details['fingerprint'] = await parsing.run(minhash, article['title'], details['content'])
+    return details
+
+# Асинхронная функция для парсинга новостей одного источника:
+# загрузка списка, отсев известных статей, загрузка новых статей, сохранение и рассылка уведомлений
+# Возвращает количество новых статей
+async def parse_news(source):
+    # Условный запрос: если сервер поддерживает ETag/Last-Modified и страница не менялась, он вернёт 304
+    with timer('scrape_fetch', source=source.name, page='listing'):
+        body, encoding, validators = await fetch_bytes_if_modified(source.listing_url, source.validators)
+    if body is None:
+        inc('scrape_listing_unchanged', source=source.name, reason='304')
+        logging.debug("Список новостей %s не изменился (304)", source.name)
+        return 0
+
+    # Список статей, найденных на странице новостей. Если сервер не поддерживает условные запросы,
+    # сравнивается хэш фрагмента со списком новостей, и неизменившийся список не разбирается
+    with timer('scrape_parse', source=source.name, page='listing'):
+        listing_hash, listing = await parsing.run(parse_listing_page, source.name, body, encoding, source.listing_hash)
+    if listing is None:
+        source.validators = validators
+        inc('scrape_listing_unchanged', source=source.name, reason='hash')
+        logging.debug("Список новостей %s не изменился (хэш)", source.name)
+        return 0
+
+    # Отсеиваем уже известные статьи до загрузки их страниц
+    seen = seen_caches[source.name]
+    listing = [article for article in listing if article['title'] not in seen]
+    if listing:
+        # Проверяем одним запросом, какие из оставшихся статей уже есть в базе данных
+        with timer('db_query', source=source.name, query='select_existing_titles'):
+            existing_titles = await select_existing_titles(source.table, [article['title'] for article in listing])
+        for title in existing_titles:
+            seen.add(title)
+        listing = [article for article in listing if article['title'] not in existing_titles]
+    if not listing:
+        source.validators, source.listing_hash = validators, listing_hash
+        return 0
+
+    # Загружаем все статьи одновременно, каждую страницу ровно один раз
+    details = await gather_limited([fetch_article(source, article) for article in listing],
+                                   DETAIL_FETCH_CONCURRENCY)
+
+    # Список статей, успешно загруженных с сайта
+    loaded_articles = []
+    for article, article_details in zip(listing, details):
+        if isinstance(article_details, Exception):
+            inc('scrape_article_errors', source=source.name)
+            logging.warning("Не удалось загрузить статью %s: %r", article['link'], article_details)
+            continue
+        loaded_articles.append({**article, **article_details})
+    # Страница списка считается обработанной, только если загрузились все статьи,
+    # иначе в следующем цикле список будет разобран заново и неудачные статьи загрузятся повторно
+    if len(loaded_articles) == len(listing):
+        source.validators, source.listing_hash = validators, listing_hash
+
+    # Поиск и сохранение статей выполняются под блокировкой, чтобы одна новость, одновременно найденная
+    # в двух источниках, не прошла проверку на повтор в обоих
+    async with duplicate_lock:
+        # Почти одинаковые статьи (та же новость в другом источнике или с исправленным заголовком):
+        # уведомление о повторе получают только подписчики на его тему, которым не отправлялась ранняя статья
+        duplicates = find_duplicates(source, loaded_articles)
+        # Создаем записи о статьях в базе данных одним запросом и получаем ID новых записей
+        columns = source.columns + ('fingerprint',)
+        with timer('db_query', source=source.name, query='insert_articles'):
+            new_ids = await insert_articles(source.table, columns,
+                                            [tuple(article[column] for column in source.columns) + (article['fingerprint'].tobytes(),)
+                                             for article in loaded_articles],
+                                            queue_source=source.name if publish_to_queue else None,
+                                            queue_duplicates={title: (duplicate_source, category) for title, (
+                                                duplicate_source, _, category) in duplicates.items()})
+        duplicate_index.extend([(source.name, new_ids[article['title']], article['fingerprint'],
+                                 article.get(source.extra_column))
+                                for article in loaded_articles if article['title'] in new_ids])
+
+    # Список, в который будут добавляться данные о новых статьях
+    new_articles_data = []
+    news_counts[source.name] += len(new_ids)
+    inc('scrape_new_articles', len(new_ids), source=source.name)
+    for article in loaded_articles:
+        seen.add(article['title'])
+        if article['title'] in new_ids:
+            article_info = {'id': new_ids[article['title']], **article}
+            if article['title'] in duplicates:
+                duplicate_source, duplicate_id, duplicate_category = duplicates[article['title']]
+                article_info['notified_topic'] = (duplicate_source, duplicate_category)
+                inc('duplicate_articles', source=source.name)
+                logging.info("Статья %s %s - повтор статьи %s %s, уведомление только подписчикам на её тему",
+                             source.name, article_info['id'], duplicate_source, duplicate_id)
+            new_articles_data.append(article_info)
+            # Сразу кладём новую статью в кэш: её будут открывать из уведомлений и страниц
+            article_cache.put((source.name, article_info['id']), render_article(source, article_info))
+            # Подготовка подписей и клавиатур для пачки статей занимает заметное время:
+            # отдаём управление циклу событий после каждой статьи, чтобы обработчики пользователей не ждали
+            await asyncio.sleep(0)
+
+    # В режиме 'scraper' статьи уже поставлены в очередь вместе со вставкой, уведомления рассылает процесс бота
+    if publish_to_queue:
+        if new_ids:
+            await article_queue.notify(source.name, len(new_ids))
+    # Если есть новые статьи, отправляем уведомления пользователям, которые подписаны на уведомления
+    # При большом количестве новых статей (или пока собирается подборка) статьи отправляются подборкой
+    elif new_articles_data and digests.accepts(len(new_articles_data)):
+        digests.add([(source, article_info, None) for article_info in new_articles_data])
+    elif new_articles_data:
+        # Готовим уведомление для каждой статьи один раз и ставим рассылку в очередь
+        notifications = []
+        for article_info in new_articles_data:
+            notifications.append((article_info, make_notification(source, article_info)))
+            await asyncio.sleep(0)
+        # Отправка уведомлений подписчикам на все новости и на темы этих статей
+        enqueue_notifications(source, notifications)
+    return sum('notified_topic' not in article_info for article_info in new_articles_data)
+
+
+# Функция для постановки уведомлений источника в рассылку. notifications - список (данные статьи, уведомление).
+# Подписчики на все новости получают все уведомления, кроме повторов, одним заданием с одним снимком массива
+# подписчиков. Остальные получатели определяются по категории статьи через индекс подписок, статьи одной
+# категории рассылаются вместе. Повтор (notified_topic в данных статьи) получают только подписчики на его тему,
+# которым не отправлялась ранняя статья. Возвращает уведомления, которые некому отправлять
+def enqueue_notifications(source, notifications):
+    everyone = subscribers.snapshot()
+    broadcaster.enqueue(everyone, [notification for article_info, notification in notifications
+                                   if 'notified_topic' not in article_info])
+    by_topic = {}
+    for article_info, notification in notifications:
+        topic = (article_info.get(source.extra_column) or '', article_info.get('notified_topic'))
+        by_topic.setdefault(topic, []).append(notification)
+    unsent = []
+    for (category, notified), topic_notifications in by_topic.items():
+        chat_ids = topic_index.interested(source.name, category, subscribers, notified)
+        if chat_ids:
+            broadcaster.enqueue(chat_ids, topic_notifications)
+        elif not everyone or notified is not None:
+            unsent += topic_notifications
+    return unsent
+
+
+# Функция для подготовки уведомления о новой статье
+def make_notification(source, article_info, queue_id=None):
+    links = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text='Читать', url=article_info['link'])]
+    ])
+    return Notification(photo=article_info['photo'],
+                        caption=source.format_notification(article_info),
+                        reply_markup=links,
+                        article_key=(source.name, article_info['id']),
+                        photo_file_id=article_info.get('photo_file_id'),
+                        queue_id=queue_id)
+
+
+# Асинхронная функция для рассылки накопленных статей подборками. articles - список (источник, данные статьи,
+# id в очереди). Пользователи с одинаковым набором тем получают одни и те же подборки
+async def send_digests(articles):
+    def topic_of(article):
+        source, article_info, _ = article
+        return source.name, article_info.get(source.extra_column) or '', article_info.get('notified_topic')
+    topics = list(dict.fromkeys(topic_of(article) for article in articles))
+    audiences = group_audiences(topics, subscribers, topic_index)
+    delivered = set()
+    for audience_topics, chat_ids in audiences.items():
+        audience_digests = make_digests([article for article in articles if topic_of(article) in audience_topics])
+        for digest in audience_digests:
+            digest_queue_refs.update(digest.queue_ids)
+        broadcaster.enqueue(chat_ids, audience_digests)
+        delivered |= audience_topics
+    # Статьи тем без получателей сразу убираем из очереди
+    for article in articles:
+        if topic_of(article) not in delivered and article[2] is not None:
+            await article_queue.complete(article[2])
+    logging.info("Подборка статей поставлена в рассылку: статей %d, групп получателей %d", len(articles), len(audiences))
+
+# Накопитель статей для подборок (включается DIGEST_THRESHOLD в config.py)
+digests = DigestBuffer(send_digests)
+
+
+# Публиковать новые статьи в очередь PostgreSQL вместо рассылки из этого процесса (режим запуска 'scraper')
+publish_to_queue = False
+
+
+# Событие: в очереди PostgreSQL могут быть статьи, которые нужно забрать, как только разослана текущая пачка
+queue_claim_requested = asyncio.Event()
+
+
+# Асинхронная функция для рассылки статей из очереди PostgreSQL (режим запуска 'bot').
+# Новая пачка забирается, только когда разослана предыдущая, чтобы остальные экземпляры бота могли забрать свою.
+# Оповещение, пришедшее во время рассылки, и полная пачка (в очереди остались статьи) не теряются:
+# следующую пачку заберёт claim_queued_after_broadcast
+async def send_queued_articles():
+    if broadcaster.backlog():
+        queue_claim_requested.set()
+        return
+    queue_claim_requested.clear()
+    try:
+        claimed = await article_queue.claim(QUEUE_BATCH_SIZE)
+        if not claimed:
+            return
+        if len(claimed) == QUEUE_BATCH_SIZE:
+            queue_claim_requested.set()
+        # {источник: {id статьи: id в очереди}} и {id в очереди: тема ранней статьи той же новости}
+        queue_ids, notified_topics = {}, {}
+        for queue_id, source_name, article_id, duplicate_source, duplicate_category in claimed:
+            queue_ids.setdefault(source_name, {})[article_id] = queue_id
+            if duplicate_source is not None:
+                notified_topics[queue_id] = (duplicate_source, duplicate_category)
+        # Список (источник, данные статьи, id в очереди)
+        articles = []
+        for source_name, source_queue_ids in queue_ids.items():
+            source = SOURCES_BY_NAME.get(source_name)
+            if source is not None:
+                columns = ('id', 'title', 'photo', 'time', source.extra_column, 'link', 'photo_file_id')
+                rows = await db.fetchall(f"SELECT {', '.join(columns)} FROM {source.table} WHERE id = ANY(%s)",
+                                         (list(source_queue_ids),))
+                for row in rows:
+                    article_info = dict(zip(columns, row))
+                    queue_id = source_queue_ids.pop(article_info['id'])
+                    if queue_id in notified_topics:
+                        article_info['notified_topic'] = notified_topics[queue_id]
+                    articles.append((source, article_info, queue_id))
+            # Статьи неизвестных источников и удалённые статьи просто убираем из очереди
+            for queue_id in source_queue_ids.values():
+                logging.warning("Статья %s из очереди уведомлений не найдена", queue_id)
+                await article_queue.complete(queue_id)
+
+        if digests.accepts(len(articles)):
+            digests.add(articles)
+        else:
+            by_source = {}
+            for source, article_info, queue_id in articles:
+                by_source.setdefault(source, []).append((article_info, make_notification(source, article_info, queue_id)))
+            for source, notifications in by_source.items():
+                # Статьи, которые некому отправлять, сразу убираем из очереди
+                for notification in enqueue_notifications(source, notifications):
+                    await article_queue.complete(notification.queue_id)
+        logging.info("Из очереди уведомлений взято статей: %d", len(articles))
+    except Exception:
+        logging.exception("Ошибка при обработке очереди уведомлений")
+
+
+# Асинхронная функция, забирающая следующую пачку статей из очереди сразу после рассылки предыдущей,
+# если она была запрошена, а не через QUEUE_POLL_INTERVAL
+async def claim_queued_after_broadcast():
+    while True:
+        await queue_claim_requested.wait()
+        await broadcaster.join()
+        await send_queued_articles()
+
+
+# Функция для учёта новых статей, о которых сообщил процесс парсинга (для количества страниц)
+def count_queued_articles(source_name, count):
+    if source_name in news_counts:
+        news_counts[source_name] += count
+
+
+# Асинхронная функция для периодического парсинга одного источника.
+# Каждый источник опрашивается в своей задаче со своим интервалом, поэтому медленный
+# или сломанный сайт не задерживает остальные
+async def parse_news_periodically(source):
+    # Случайная задержка старта, чтобы источники не опрашивались одновременно
+    await asyncio.sleep(random.uniform(0, source.jitter))
+    while True:
+        cycle_start = time.perf_counter()
+        result = 'ok'
+        try:
+            # Если профилирование цикла запрошено (через /profile или сигнал), профилируем этот цикл
+            with profile_cycle(source.name):
+                new_count = await asyncio.wait_for(parse_news(source), source.timeout)
+            source.adapt_interval(new_count)
+        except asyncio.TimeoutError:
+            result = 'timeout'
+            logging.warning("Парсинг %s не уложился в %s с", source.name, source.timeout)
+        except Exception:
+            result = 'error'
+            logging.exception("Ошибка при парсинге %s", source.name)
+        cycle_time = time.perf_counter() - cycle_start
+        metrics.observe('scrape_cycle', cycle_time, source=source.name)
+        inc('scrape_cycles', source=source.name, result=result)
+        # Сообщаем длительность цикла парсинга
+        logging.info("Цикл парсинга %s: %.2f с; следующий через %.0f с; кэш статей: %s",
+                     source.name, cycle_time, source.interval, article_cache.stats())
+        await asyncio.sleep(source.interval + random.uniform(0, source.jitter))
+
+
+# Количество новостей на одной странице
+ITEMS_PER_PAGE = 5
+
+# Асинхронная функция для получения страницы новостей по ключу (от новых к старым).
+# Стоимость запроса не зависит от номера страницы: используется индекс по id вместо OFFSET.
+# direction 'next' - статьи старше anchor_id, 'prev' - статьи новее anchor_id
+async def select_news_page(source, direction=None, anchor_id=None):
+    columns = ('id', 'title', 'photo', 'time', source.extra_column, 'link', 'photo_file_id')
+    query = f"SELECT {', '.join(columns)} FROM {source.table}"
+    if anchor_id is None:
+        news = await db.fetchall(f"{query} ORDER BY id DESC LIMIT %s", (ITEMS_PER_PAGE,))
+    elif direction == 'prev':
+        news = await db.fetchall(f"{query} WHERE id > %s ORDER BY id ASC LIMIT %s", (anchor_id, ITEMS_PER_PAGE))
+        news = news[::-1]
+    else:
+        news = await db.fetchall(f"{query} WHERE id < %s ORDER BY id DESC LIMIT %s", (anchor_id, ITEMS_PER_PAGE))
+    return [dict(zip(columns, article_info)) for article_info in news]
+
+# Функция для формирования клавиатуры пагинации.
+# В callback data передаётся номер страницы, направление и ID крайней статьи текущей страницы
+def get_pagination_keyboard(prefix, page_number, total_news_count, news):
+    total_pages = total_news_count // ITEMS_PER_PAGE + (1 if total_news_count % ITEMS_PER_PAGE > 0 else 0)
+    pagination_buttons = []
+    if page_number > 2 and news:
+        pagination_buttons.append(InlineKeyboardButton(text='◀️', callback_data=f"{prefix}_page_{page_number - 1}_prev_{news[0]['id']}"))
+    elif page_number == 2:
+        # Первая страница всегда показывает самые свежие новости
+        pagination_buttons.append(InlineKeyboardButton(text='◀️', callback_data=f"{prefix}_page_1"))
+    pagination_buttons.append(InlineKeyboardButton(text=f'{page_number}/{total_pages}', callback_data="current_page"))
+    if page_number < total_pages and news:
+        pagination_buttons.append(InlineKeyboardButton(text='▶️', callback_data=f"{prefix}_page_{page_number + 1}_next_{news[-1]['id']}"))
+    return InlineKeyboardMarkup(inline_keyboard=[pagination_buttons])
+
+# Функция для разбора callback data кнопки пагинации: номер страницы, направление и ID крайней статьи
+def parse_page_callback(data):
+    parts = data.split('_')
+    if len(parts) < 5:
+        return 1, None, None
+    return int(parts[2]), parts[3], int(parts[4])
+
+# Функция для формирования callback data, повторно открывающей текущую страницу
+def get_page_callback(prefix, page_number, news):
+    if page_number == 1:
+        return f"{prefix}_page_1"
+    return f"{prefix}_page_{page_number}_next_{news[0]['id'] + 1}"
+
+# Асинхронная функция для отображения страницы новостей одним сообщением (режим 'compact').
+# Подпись содержит список статей, фото берётся из первой статьи.
+# При переходе между страницами сообщение изменяется на месте (edit=True), а не отправляется заново
+async def show_compact_page(message, source, news, page_number, edit):
+    if not news:
+        await message.answer("Новостей пока нет.")
+        return
+
+    caption = '\n\n'.join(source.format_page_line(number, article_info) for number, article_info in enumerate(news, 1))
+    # Кнопки с номерами открывают статью в этом же сообщении
+    page_callback = get_page_callback(source.name, page_number, news)
+    article_buttons = [InlineKeyboardButton(text=str(number), callback_data=f'{source.name}_item_{article_info["id"]}|{page_callback}')
+                       for number, article_info in enumerate(news, 1)]
+    keyboard = get_pagination_keyboard(source.name, page_number, news_counts[source.name], news)
+    keyboard.inline_keyboard.insert(0, article_buttons)
+
+    first_article = news[0]
+    if edit:
+        await edit_article_photo(message, (source.name, first_article['id']),
+                                 photo=first_article['photo'], photo_file_id=first_article['photo_file_id'],
+                                 caption=caption[:1024], reply_markup=keyboard)
+    else:
+        await send_article_photo(message.chat.id, (source.name, first_article['id']),
+                                 photo=first_article['photo'], photo_file_id=first_article['photo_file_id'],
+                                 caption=caption[:1024], reply_markup=keyboard)
+
+
+# Асинхронная функция для получения новостей источника
+async def get_news(message: types.Message, source, page_number: int = 1, direction: str = None, anchor_id: int = None,
+                   edit: bool = False):
+    # Получение новостей текущей страницы из базы данных
+    news = await select_news_page(source, direction, anchor_id)
+
+    if PAGINATION_MODE == 'compact':
+        await show_compact_page(message, source, news, page_number, edit)
+        return
+
+    # Отправка новостей текущей страницы пользователю
+    for article_info in news:
+        await send_article_photo(
+            message.chat.id, (source.name, article_info['id']),
+            photo=article_info['photo'],
+            photo_file_id=article_info['photo_file_id'],
+            caption=source.format_caption(article_info),
+            reply_markup=get_article_keyboard(source, article_info['id'], article_info['link'], False)
+        )
+
+    # Создание клавиатуры пагинации по закэшированному количеству статей
+    pagination_keyboard = get_pagination_keyboard(source.name, page_number, news_counts[source.name], news)
+
+    # Отправка клавиатуры пагинации
+    await message.answer("Выберите страницу:", reply_markup=pagination_keyboard)
+
+# Обработчик раскрытия и скрытия содержания новостей
+@dp.callback_query(lambda callback: callback.data.startswith(('open_content_', 'close_content_')))
+async def toggle_content(callback: CallbackQuery):
+    await callback.answer()
+    action, _, source_name, article_id = callback.data.split('_')  # Получаем источник и ID статьи из callback data
+    source = SOURCES_BY_NAME[source_name]
+
+    # Получение отрисованной статьи из кэша или базы данных
+    article = await get_article(source, int(article_id))
+    if article:
+        # Обновляем подпись сообщения: содержание статьи или изначальный вид
+        caption, links = article['open' if action == 'open' else 'closed']
+        await bot.edit_message_caption(
+            chat_id=callback.message.chat.id,
+            message_id=callback.message.message_id,
+            caption=caption,
+            reply_markup=links
+        )
+    else:
+        await bot.send_message(callback.message.chat.id, "Статья не найдена.")
+
+
+# Обработчик нажатия кнопок пагинации
+@dp.callback_query(lambda callback_query: callback_query.data.split('_')[0] in SOURCES_BY_NAME
+                                          and callback_query.data.split('_')[1:2] == ['page'])
+async def process_page_selection(callback_query: types.CallbackQuery):
+    source = SOURCES_BY_NAME[callback_query.data.split('_')[0]]
+    page_number, direction, anchor_id = parse_page_callback(callback_query.data)
+    # В компактном режиме страница открывается в том же сообщении, если это сообщение с фото
+    edit = PAGINATION_MODE == 'compact' and bool(callback_query.message.photo)
+    with count_page_view(PAGINATION_MODE):
+        await get_news(callback_query.message, source, page_number, direction, anchor_id, edit)
+    await bot.answer_callback_query(callback_query.id)
+
+
+# Обработчик открытия статьи со страницы в компактном режиме: статья показывается в том же сообщении
+@dp.callback_query(lambda callback: callback.data.split('_')[0] in SOURCES_BY_NAME
+                                    and callback.data.split('_')[1:2] == ['item'])
+async def show_compact_article(callback: CallbackQuery):
+    await callback.answer()
+    item, page_callback = callback.data.split('|', 1)
+    source_name, _, article_id = item.split('_')
+    source = SOURCES_BY_NAME[source_name]
+
+    article = await get_article(source, int(article_id))
+    if not article:
+        await bot.send_message(callback.message.chat.id, "Статья не найдена.")
+        return
+
+    links = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text='Читать', url=article['link'])],
+        [InlineKeyboardButton(text='⬅️ К списку', callback_data=page_callback)]
+    ])
+    await edit_article_photo(callback.message, (source.name, int(article_id)),
+                             photo=article['photo'], photo_file_id=article['photo_file_id'],
+                             caption=f'📋 Заголовок: {article["title"]}\n\n📰Содержание: {article["content"]}'[:1024],
+                             reply_markup=links)
+
+
+# Обработчик нажатия на кнопку текущей страницы
+@dp.callback_query(lambda callback_query: callback_query.data == 'current_page')
+async def subscribe(callback: CallbackQuery):
+    await callback.answer('')
+
+
+
+# Обработчик команды "Новости"
+@dp.message(F.text == '📋 Новости')
+async def get_notification(message: Message):
+    await message.answer('Выберите источник новостей:',
+                         reply_markup=get_news_keyboard())
+    
+def get_news_keyboard():
+    news = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=source.title, callback_data=f'{source.name}_news')] for source in SOURCES
+    ]) 
+    return news
+
+# Обработчик нажатия на кнопку для вывода новостей источника
+@dp.callback_query(lambda callback: callback.data.removesuffix('_news') in SOURCES_BY_NAME)
+async def source_news_button(callback: CallbackQuery):
+    await callback.answer('')
+    with count_page_view(PAGINATION_MODE):
+        await bot.delete_message(callback.message.chat.id, callback.message.message_id)
+        await get_news(callback.message, SOURCES_BY_NAME[callback.data.removesuffix('_news')])
+
+
+# Начало первой строки сообщения с результатами поиска. По этой строке кнопки пагинации
+# восстанавливают запрос, поэтому он не хранится ни в памяти бота, ни в callback data
+SEARCH_HEADER = '🔎 Поиск: '
+
+# Асинхронная функция для отображения страницы результатов поиска одним текстовым сообщением.
+# Кнопки с номерами присылают статью, при переходе между страницами сообщение изменяется на месте (edit=True)
+async def show_search_page(message, query, page_number, edit):
+    news, total = await search_articles(query, (page_number - 1) * ITEMS_PER_PAGE, ITEMS_PER_PAGE)
+    if not news:
+        text, keyboard = f'{SEARCH_HEADER}{query}\n\nНичего не найдено.', None
+    else:
+        lines = [f'{number}. {article_info["title"]}\n🕰 {source.format_time(article_info["time"])} · {source.title}'
+                 for number, (source, article_info) in enumerate(news, (page_number - 1) * ITEMS_PER_PAGE + 1)]
+        text = f'{SEARCH_HEADER}{query}\n\n' + '\n\n'.join(lines)
+        article_buttons = [InlineKeyboardButton(text=str(number), callback_data=f'found_{source.name}_{article_info["id"]}')
+                           for number, (source, article_info) in enumerate(news, (page_number - 1) * ITEMS_PER_PAGE + 1)]
+        # Пагинация общая со страницами новостей: используется только номер страницы
+        keyboard = get_pagination_keyboard('search', page_number, total, [article_info for _, article_info in news])
+        keyboard.inline_keyboard.insert(0, article_buttons)
+
+    if not edit:
+        await message.answer(text, reply_markup=keyboard)
+        return
+    try:
+        await message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Повторное нажатие на ту же кнопку - сообщение уже в нужном виде
+        if 'message is not modified' not in str(e):
+            raise
+
+# Обработчик команды /search <запрос>
+@dp.message(Command('search'))
+async def cmd_search(message: Message, command: CommandObject):
+    query = normalize_query(command.args)
+    if not query:
+        await message.answer('Напишите, что найти, например: /search курс тенге')
+        return
+    await show_search_page(message, query, 1, edit=False)
+
+# Обработчик нажатия кнопок пагинации результатов поиска
+@dp.callback_query(lambda callback: callback.data.startswith('search_page_'))
+async def process_search_page(callback: CallbackQuery):
+    await callback.answer()
+    query = callback.message.text.split('\n', 1)[0].removeprefix(SEARCH_HEADER)
+    page_number, _, _ = parse_page_callback(callback.data)
+    await show_search_page(callback.message, query, page_number, edit=True)
+
+# Обработчик нажатия на номер статьи в результатах поиска: статья присылается отдельным сообщением
+@dp.callback_query(lambda callback: callback.data.startswith('found_'))
+async def show_found_article(callback: CallbackQuery):
+    await callback.answer()
+    _, source_name, article_id = callback.data.split('_')
+    source = SOURCES_BY_NAME[source_name]
+
+    article = await get_article(source, int(article_id))
+    if not article:
+        await bot.send_message(callback.message.chat.id, "Статья не найдена.")
+        return
+    caption, links = article['closed']
+    await send_article_photo(callback.message.chat.id, (source.name, int(article_id)),
+                             photo=article['photo'], photo_file_id=article['photo_file_id'],
+                             caption=caption, reply_markup=links)
+
+# Обработчик поиска в inline-режиме (@имя_бота запрос в любом чате).
+# Следующие результаты Telegram запрашивает сам, передавая offset из next_offset предыдущего ответа
+@dp.inline_query()
+async def inline_search(inline_query: InlineQuery):
+    query = normalize_query(inline_query.query)
+    if not query:
+        await inline_query.answer([], cache_time=60)
+        return
+    offset = int(inline_query.offset or 0)
+    news, total = await search_articles(query, offset, SEARCH_INLINE_RESULTS)
+    results = [
+        InlineQueryResultArticle(
+            id=f'{source.name}_{article_info["id"]}',
+            title=article_info['title'],
+            description=f'{source.title} · {source.format_time(article_info["time"])}',
+            url=article_info['link'],
+            thumbnail_url=article_info['photo'],
+            input_message_content=InputTextMessageContent(message_text=f'📋 {article_info["title"]}\n{article_info["link"]}'),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text='Читать', url=article_info['link'])]
+            ])
+        )
+        for source, article_info in news
+    ]
+    next_offset = str(offset + len(news)) if offset + len(news) < total else ''
+    await inline_query.answer(results, cache_time=60, next_offset=next_offset)
+
+
+# Функция для регистрации показателей состояния бота, вычисляемых при чтении метрик
+def register_gauges():
+    metrics.gauge('broadcast_backlog', broadcaster.backlog)
+    metrics.gauge('subscribers', lambda: len(subscribers))
+    metrics.gauge('topic_subscriptions', lambda: len(topic_index))
+    metrics.gauge('duplicate_index_size', lambda: len(duplicate_index))
+    metrics.gauge('article_cache_size', lambda: article_cache.stats()['size'])
+    metrics.gauge('article_cache_hits', lambda: article_cache.stats()['hits'])
+    metrics.gauge('article_cache_misses', lambda: article_cache.stats()['misses'])
+    for source in SOURCES:
+        metrics.gauge(f'scrape_interval_seconds{{source="{source.name}"}}', lambda source=source: source.interval)
+
+# Основная асинхронная функция.
+# mode: 'all' - парсинг и бот в одном процессе, 'scraper' - только парсинг, 'bot' - только бот
+async def main(mode=RUN_MODE):
+    global publish_to_queue
+    if mode not in ('all', 'scraper', 'bot'):
+        raise ValueError(f'Неизвестный режим запуска: {mode}')
+    publish_to_queue = mode == 'scraper'
+    # Открываем пул соединений с базой данных
+    await db.open_pool()
+    # Заполняем кэши известных статей и количество статей до первого цикла парсинга
+    if mode != 'bot':
+        await warm_seen_caches()
+        await warm_duplicate_index()
+    await warm_news_counts()
+    # Запуск пула процессов для разбора страниц
+    if mode != 'bot':
+        parsing.start()
+    # Загрузка подписчиков в память и запуск очереди рассылки уведомлений
+    if mode != 'scraper':
+        await subscribers.load()
+        await topic_index.load()
+        broadcaster.start()
+    # Запуск сервера метрик и периодического вывода метрик в лог (если включены в config.py)
+    register_gauges()
+    stop_metrics = await metrics.start()
+    tasks = []
+    # Запуск асинхронных задач для периодического парсинга каждого источника
+    if mode != 'bot':
+        tasks += [asyncio.create_task(parse_news_periodically(source)) for source in SOURCES]
+    # Процесс бота при раздельном запуске забирает новые статьи из очереди в PostgreSQL
+    if mode == 'bot':
+        tasks.append(asyncio.create_task(article_queue.listen(count_queued_articles, send_queued_articles)))
+        tasks.append(asyncio.create_task(claim_queued_after_broadcast()))
+        tasks.append(asyncio.create_task(article_queue.renew_leases()))
+    # Периодическая сверка подписчиков в памяти с базой данных
+    if mode != 'scraper':
+        tasks.append(asyncio.create_task(reconcile_periodically(subscribers, topic_index)))
+    try:
+        if mode == 'scraper':
+            await asyncio.gather(*tasks)
+        else:
+            # Запуск диспетчера для обработки входящих сообщений
+            await dp.start_polling(bot)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Останавливаем рассылку, закрываем общую HTTP-сессию парсеров и пул соединений с базой данных
+        await digests.stop()
+        await broadcaster.stop()
+        parsing.shutdown()
+        await stop_metrics()
+        await close_session()
+        await db.close_pool()
+
+# Точка входа в программу
+if __name__ == '__main__':
+    try:
+        logging.basicConfig(level=logging.INFO)
+        # Запуск основной асинхронной функции
+        asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else RUN_MODE))
+    except KeyboardInterrupt:
+        print('Exit')
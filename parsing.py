@@ -0,0 +1,32 @@
+import asyncio, logging, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import PARSE_WORKERS
+
+# Пул процессов для разбора HTML (None - разбор выполняется в потоке цикла событий)
+_executor = None
+
+
+# Функция для запуска пула процессов разбора.
+# Процессы запускаются через spawn: дочерний процесс не наследует цикл событий, соединения и потоки родителя
+def start(workers=PARSE_WORKERS):
+    global _executor
+    if workers and _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        logging.info("Разбор страниц выполняется в %d процессах", workers)
+
+
+# Функция для остановки пула процессов разбора
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+# Асинхронная функция для выполнения разбора в пуле процессов.
+# func должна быть функцией уровня модуля, а аргументы и результат - компактными (байты страницы, словари)
+async def run(func, *args):
+    if _executor is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
@@ -0,0 +1,51 @@
+import db
+from config import SEARCH_CANDIDATES
+from metrics import timer
+from sources import SOURCES, SOURCES_BY_NAME
+
+# Конфигурация полнотекстового поиска PostgreSQL: должна совпадать с migrations/006_search.sql
+SEARCH_CONFIG = 'russian'
+# Максимальная длина запроса
+QUERY_LIMIT = 100
+# Стоимость чтения случайной страницы для планировщика при поиске (см. search_articles)
+SEARCH_RANDOM_PAGE_COST = 1.1
+
+
+# Функция для приведения запроса пользователя к одной строке ограниченной длины
+def normalize_query(text):
+    return ' '.join((text or '').split())[:QUERY_LIMIT]
+
+
+# Функция для получения SQL поиска по всем источникам.
+# Запрос разбирается websearch_to_tsquery: слова, "фраза в кавычках", -исключение, or.
+# Из каждой таблицы берутся SEARCH_CANDIDATES самых новых подходящих статей, они упорядочиваются
+# по ts_rank (совпадение в заголовке весит больше, чем в содержании), затем от новых к старым.
+# Редкие слова находятся по GIN-индексу, для частых быстрее пройти по индексу id от новых статей:
+# план выбирается по статистике слов, поэтому запрос записан без общего подзапроса с tsquery
+def search_query(sources=SOURCES):
+    tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %(query)s)"
+    found = ' UNION ALL '.join(
+        f"(SELECT '{source.name}' AS source, id, title, photo, time, link, search "
+        f"FROM {source.table} WHERE search @@ {tsquery} ORDER BY id DESC LIMIT %(candidates)s)"
+        for source in sources)
+    return (f"SELECT source, id, title, photo, time, link, count(*) OVER () FROM ({found}) AS found "
+            f"ORDER BY ts_rank(search, {tsquery}) DESC, id DESC LIMIT %(limit)s OFFSET %(offset)s")
+
+
+# Асинхронная функция для поиска статей по запросу: limit результатов, начиная с offset.
+# Возвращает список (источник, данные статьи) и общее количество найденных статей (не больше
+# SEARCH_CANDIDATES на источник)
+async def search_articles(query, offset=0, limit=5):
+    params = {'query': query, 'candidates': SEARCH_CANDIDATES, 'limit': limit, 'offset': offset}
+    with timer('db_query', query='search_articles'):
+        async with db.pool.connection() as connection:
+            # Индекс и свежие статьи обычно в памяти: с random_page_cost по умолчанию (4) планировщик
+            # слишком долго предпочитает проход по id и для слов средней частоты перебирает десятки тысяч строк
+            await connection.execute(f"SET LOCAL random_page_cost = {SEARCH_RANDOM_PAGE_COST}")
+            # Без подготовленного запроса: общий план подготовленного запроса не учитывает частоту слов
+            cursor = await connection.execute(search_query(), params, prepare=False)
+            rows = await cursor.fetchall()
+    results = [(SOURCES_BY_NAME[source_name], {'id': article_id, 'title': title, 'photo': photo,
+                                               'time': published, 'link': link})
+               for source_name, article_id, title, photo, published, link, _ in rows]
+    return results, rows[0][-1] if rows else 0
@@ -0,0 +1,245 @@
+import hashlib, re
+
+from dateutil import parser
+
+from extract import class_xpath, first, parse_document, parse_fragment, read_article, text_of
+
+from config import (SCRAPE_INTERVAL, SCRAPE_JITTER, SCRAPE_TIMEOUT, SOURCE_INTERVALS,
+                    SCRAPE_MIN_INTERVAL, SCRAPE_MAX_INTERVAL, SCRAPE_BACKOFF)
+
+
+# Базовый класс источника новостей.
+# Источник описывает только особенности сайта: адрес списка новостей, разбор списка и страницы статьи,
+# оформление подписей. Загрузка, отсев известных статей, сохранение и рассылка общие для всех источников.
+class NewsSource:
+    # Имя источника: используется в callback data и в имени таблицы {name}_news
+    name = None
+    # Название для кнопок и подписей уведомлений
+    title = None
+    site = None
+    # Адрес страницы со списком новостей
+    listing_url = None
+    # Колонка таблицы с особым для сайта полем (хэштег, категория и т.п.)
+    extra_column = None
+    # Начало блока одной новости в HTML списка (например, его класс).
+    # По нему без полного разбора HTML выделяется фрагмент со списком новостей
+    listing_marker = None
+
+    def __init__(self):
+        # Расписание опроса сайта. Интервал меняется в пределах
+        # [min_interval, max_interval] в зависимости от того, появляются ли новые статьи
+        self.interval = SOURCE_INTERVALS.get(self.name, SCRAPE_INTERVAL)
+        self.min_interval = min(SCRAPE_MIN_INTERVAL, self.interval)
+        self.max_interval = max(SCRAPE_MAX_INTERVAL, self.interval)
+        self.jitter = SCRAPE_JITTER
+        self.timeout = SCRAPE_TIMEOUT
+        # Заголовки ETag/Last-Modified последней обработанной страницы списка и хэш фрагмента со списком
+        self.validators = {}
+        self.listing_hash = None
+
+    @property
+    def table(self):
+        return f'{self.name}_news'
+
+    # Колонки таблицы, заполняемые парсером
+    @property
+    def columns(self):
+        return ('title', 'photo', 'time', self.extra_column, 'link', 'content')
+
+    # Метод для выделения фрагмента страницы со списком новостей.
+    # Остальная часть страницы (реклама, счётчики, токены) меняется при каждой загрузке и в хэш не входит
+    def listing_fragment(self, html):
+        start = html.find(self.listing_marker) if self.listing_marker else -1
+        if start == -1:
+            return html
+        # Фрагмент начинается с тега первой новости и заканчивается закрывающим тегом последней
+        start = html.rfind('<', 0, start)
+        return html[start:element_end(html, html.rfind('<', 0, html.rfind(self.listing_marker)))]
+
+    # Метод для получения дерева lxml списка новостей: только фрагмент со списком или,
+    # если fragment=False, вся страница
+    def listing_tree(self, html, fragment=True):
+        return parse_fragment(self.listing_fragment(html)) if fragment else parse_document(html)
+
+    # Метод для вычисления хэша списка новостей
+    def hash_listing(self, html):
+        return hashlib.blake2b(self.listing_fragment(html).encode(), digest_size=16).digest()
+
+    # Метод для подстройки интервала опроса: при появлении новых статей опрашиваем чаще,
+    # в тихие периоды постепенно реже
+    def adapt_interval(self, new_count):
+        if new_count:
+            self.interval = max(self.min_interval, self.interval / SCRAPE_BACKOFF)
+        else:
+            self.interval = min(self.max_interval, self.interval * SCRAPE_BACKOFF)
+
+    # Метод для разбора страницы со списком новостей (fragment - разбирать только фрагмент со списком).
+    # Возвращает список словарей с ключами title, link, time, extra_column и, если есть в списке, photo
+    def parse_listing(self, html, fragment=True):
+        raise NotImplementedError
+
+    # Метод для разбора страницы статьи. Возвращает словарь с content и, если фото нет в списке, photo
+    def parse_article(self, html):
+        raise NotImplementedError
+
+    # Метод для форматирования времени публикации для показа пользователю
+    def format_time(self, value):
+        return value
+
+    # Метод для формирования подписи статьи (заголовок, время, особое поле)
+    def format_caption(self, article):
+        raise NotImplementedError
+
+    # Метод для формирования строки статьи в списке компактной страницы
+    def format_page_line(self, number, article):
+        raise NotImplementedError
+
+    # Метод для формирования подписи уведомления о новой статье
+    def format_notification(self, article):
+        return f'🔔 Новая публикация!\n{self.format_caption(article)}\nСайт: {self.site}'
+
+
+# Функция для получения позиции конца элемента HTML, начинающегося в позиции start: после закрывающего тега
+# с учётом вложенных элементов с тем же тегом. Если закрывающий тег не найден - конец страницы
+def element_end(html, start):
+    tag = re.match(r'<([a-zA-Z][\w-]*)', html[start:start + 64])
+    if tag is None:
+        return len(html)
+    depth = 0
+    for match in re.compile(rf'<(/?){tag.group(1)}(?=[\s>/])', re.IGNORECASE).finditer(html, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            end = html.find('>', match.end())
+            return end + 1 if end != -1 else len(html)
+    return len(html)
+
+
+# Длина содержимого статьи, сохраняемого в базе данных
+CONTENT_LIMIT = 600
+
+
+# Функция для обрезки содержимого статьи до 600 символов
+def limit_content(content):
+    return content[:CONTENT_LIMIT] + '...'
+
+
+# Источник новостей Informburo
+class InformburoSource(NewsSource):
+    name = 'informburo'
+    title = 'Informburo'
+    site = 'informburo.kz'
+    listing_url = 'https://informburo.kz/novosti'
+    extra_column = 'mark'
+    listing_marker = 'uk-grid uk-grid-small uk-margin-remove-top'
+
+    # Выражения XPath компилируются один раз
+    _blocks = class_xpath('li', 'uk-grid uk-grid-small uk-margin-remove-top')
+    _article_block = class_xpath('div', 'uk-width-expand')
+    _photo_block = class_xpath('div', 'uk-width-auto')
+    _mark = class_xpath('span', 'article-mark')
+    _time = class_xpath('time', 'article-time')
+
+    # Разбирается только фрагмент страницы с блоками новостей
+    def parse_listing(self, html, fragment=True):
+        listing = []
+        # Проходим по всем блокам с новостями на сайте
+        for block in self._blocks(self.listing_tree(html, fragment)):
+            article_block = first(self._article_block, block)
+            photo_block = first(self._photo_block, block)
+            link = article_block.find('.//a')
+            # Проверяем наличие хэштега
+            article_mark = text_of(first(self._mark, article_block))
+            article_mark = article_mark.strip() if article_mark is not None else '#отсутствует'
+
+            listing.append({
+                'title': (link.text or '').strip(),
+                'photo': 'https://informburo.kz' + photo_block.find('.//img').get('data-src'),
+                'time': text_of(first(self._time, article_block)).strip(),
+                'mark': article_mark,
+                'link': link.get('href')
+            })
+        return listing
+
+    # Разбор останавливается, как только набран текст для content
+    def parse_article(self, html):
+        content, _ = read_article(html, 'article', CONTENT_LIMIT)
+        return {'content': limit_content(content)}
+
+    def format_caption(self, article):
+        return f'📋 Заголовок: {article["title"]}\n🕰 Время публикации: {article["time"]}\n{article["mark"]}'
+
+    def format_page_line(self, number, article):
+        return f'{number}. {article["title"]}\n🕰 {article["time"]} {article["mark"]}'
+
+
+# Источник новостей Nur
+class NurSource(NewsSource):
+    name = 'nur'
+    title = 'Nur'
+    site = 'nur.kz'
+    listing_url = 'https://www.nur.kz/latest/'
+    extra_column = 'category'
+    listing_marker = 'article-preview-category__content'
+
+    # Выражения XPath компилируются один раз
+    _articles = class_xpath('a', 'article-preview-category__content')
+    _subhead = class_xpath('h2', 'article-preview-category__subhead')
+    _category = class_xpath('span', 'article-preview-category__text')
+
+    # Разбирается только фрагмент страницы с блоками новостей
+    def parse_listing(self, html, fragment=True):
+        listing = []
+        # Проходим по всем блокам с новостями на сайте
+        for article in self._articles(self.listing_tree(html, fragment)):
+            listing.append({
+                'title': text_of(first(self._subhead, article)).strip(),
+                'time': article.find('.//time').get('datetime'),
+                'category': text_of(first(self._category, article)).strip(),
+                'link': f'{article.get("href")}'
+            })
+        return listing
+
+    # Содержимое и фото статьи берутся из одной загруженной страницы,
+    # разбор останавливается, как только набран текст для content и найдено фото
+    def parse_article(self, html):
+        content, photo = read_article(html, 'formatted-body__content--wrapper', CONTENT_LIMIT,
+                                      paragraph_class='align-left formatted-body__paragraph', photo_tag='picture')
+        return {'content': limit_content(content), 'photo': photo}
+
+    # Parse the time string including timezone information
+    def format_time(self, value):
+        return parser.parse(value).strftime('%d.%m.%Y %H:%M')
+
+    def format_caption(self, article):
+        return f'📋 Заголовок: {article["title"]}\n🕰 Дата публикации: {self.format_time(article["time"])}\nКатегория: {article["category"]}'
+
+    def format_page_line(self, number, article):
+        return f'{number}. {article["title"]}\n🕰 {self.format_time(article["time"])} · {article["category"]}'
+
+
+# Все подключенные источники новостей. Чтобы добавить сайт, достаточно описать его класс и добавить сюда
+SOURCES = [NurSource(), InformburoSource()]
+SOURCES_BY_NAME = {source.name: source for source in SOURCES}
+
+
+# Функции для разбора страниц в процессах пула parsing.py. Принимают имя источника и байты страницы,
+# возвращают только разобранные данные, поэтому между процессами передаётся немного данных
+
+# Функция для разбора страницы со списком новостей. Если хэш списка совпадает с previous_hash,
+# страница не разбирается. Возвращает хэш и список статей (или None, если список не изменился)
+def parse_listing_page(source_name, body, encoding, previous_hash=None):
+    source = SOURCES_BY_NAME[source_name]
+    html = body.decode(encoding, errors='replace')
+    listing_hash = source.hash_listing(html)
+    if listing_hash == previous_hash:
+        return listing_hash, None
+    try:
+        return listing_hash, source.parse_listing(html)
+    except (AttributeError, TypeError, ValueError):
+        # Фрагмент мог быть выделен неверно (неожиданная разметка) - разбираем всю страницу
+        return listing_hash, source.parse_listing(html, fragment=False)
+
+
+# Функция для разбора страницы статьи
+def parse_article_page(source_name, body, encoding):
+    return SOURCES_BY_NAME[source_name].parse_article(body.decode(encoding, errors='replace'))
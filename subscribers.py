@@ -0,0 +1,165 @@
+import asyncio, logging
+from array import array
+from bisect import bisect_left
+
+import db
+from config import SUBSCRIBERS_RECONCILE_INTERVAL
+
+
+# Функции для работы с отсортированным массивом chat id: проверка, вставка и удаление двоичным поиском
+def _contains(ids, chat_id):
+    index = bisect_left(ids, chat_id)
+    return index < len(ids) and ids[index] == chat_id
+
+
+def _add(ids, chat_id):
+    index = bisect_left(ids, chat_id)
+    if index == len(ids) or ids[index] != chat_id:
+        ids.insert(index, chat_id)
+
+
+def _discard(ids, chat_id):
+    index = bisect_left(ids, chat_id)
+    if index < len(ids) and ids[index] == chat_id:
+        del ids[index]
+
+
+# Множество подписчиков на уведомления в памяти: отсортированный массив 64-битных chat id.
+# Занимает 8 байт на пользователя (около 8 МБ на миллион), проверка и изменение - двоичным поиском
+class SubscriberSet:
+    def __init__(self):
+        self._ids = array('q')
+        # Изменения, сделанные во время перезагрузки из базы данных: применяются к загруженному массиву
+        self._changes = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, chat_id):
+        return _contains(self._ids, chat_id)
+
+    def add(self, chat_id):
+        if self._changes is not None:
+            self._changes.append((True, chat_id))
+        _add(self._ids, chat_id)
+
+    def discard(self, chat_id):
+        if self._changes is not None:
+            self._changes.append((False, chat_id))
+        _discard(self._ids, chat_id)
+
+    # Метод для получения копии массива для рассылки: подписки и отписки во время рассылки её не меняют
+    def snapshot(self):
+        return array('q', self._ids)
+
+    # Асинхронный метод для загрузки подписчиков из базы данных без промежуточного списка всех строк.
+    # Возвращает True, если загруженное множество отличается от того, что было в памяти
+    async def load(self):
+        self._changes = []
+        try:
+            ids = array('q')
+            async for rows in db.stream("SELECT user_id FROM users WHERE notifications = TRUE ORDER BY user_id"):
+                ids.extend(user_id for (user_id,) in rows)
+            # Подписки и отписки, сделанные пока шла загрузка, могли в неё не попасть
+            for subscribed, chat_id in self._changes:
+                if subscribed:
+                    _add(ids, chat_id)
+                else:
+                    _discard(ids, chat_id)
+        finally:
+            self._changes = None
+        changed = ids != self._ids
+        if changed:
+            logging.info("Подписчики загружены из базы данных: было %d, стало %d", len(self._ids), len(ids))
+        self._ids = ids
+        return changed
+
+
+# Обратный индекс подписок по темам: (источник, категория) -> отсортированный массив chat id.
+# Пустая категория - все новости источника. Получатели статьи находятся по двум ключам,
+# без перебора всех пользователей
+class SubscriptionIndex:
+    def __init__(self):
+        self._index = {}
+        # Изменения, сделанные во время перезагрузки из базы данных (как в SubscriberSet)
+        self._changes = None
+
+    # Общее количество подписок по темам
+    def __len__(self):
+        return sum(len(ids) for ids in self._index.values())
+
+    def add(self, chat_id, source, category=''):
+        if self._changes is not None:
+            self._changes.append((True, chat_id, source, category))
+        _add(self._index.setdefault((source, category), array('q')), chat_id)
+
+    def discard(self, chat_id, source, category=''):
+        if self._changes is not None:
+            self._changes.append((False, chat_id, source, category))
+        ids = self._index.get((source, category))
+        if ids is not None:
+            _discard(ids, chat_id)
+
+    # Метод для удаления всех подписок пользователя
+    def discard_user(self, chat_id):
+        for source, category in self.topics(chat_id):
+            self.discard(chat_id, source, category)
+
+    # Метод для получения тем, на которые подписан пользователь: множество (источник, категория)
+    def topics(self, chat_id):
+        return {key for key, ids in self._index.items() if _contains(ids, chat_id)}
+
+    # Метод для получения подписчиков на темы статьи источника source с категорией category (весь источник
+    # и категория), которых нет среди everyone - подписчиков на все новости (SubscriberSet). Список без повторов.
+    # notified - тема (источник, категория) более ранней статьи о той же новости: её подписчики уже получили
+    # уведомление и тоже пропускаются. Время зависит от количества подписчиков на эти темы,
+    # а не от количества всех пользователей
+    def interested(self, source, category, everyone, notified=None):
+        topics = self._topic_ids(source, category)
+        # Подписчики на обе темы (весь источник и категорию) не должны получить статью дважды
+        ids = topics[0] if len(topics) == 1 else sorted(set().union(*topics))
+        skipped = [everyone._ids] + (self._topic_ids(*notified) if notified is not None else [])
+        return [chat_id for chat_id in ids if not any(_contains(skip, chat_id) for skip in skipped)]
+
+    # Метод для получения непустых массивов подписчиков на весь источник и на его категорию
+    def _topic_ids(self, source, category):
+        keys = [(source, '')] + ([(source, category)] if category else [])
+        return [self._index[key] for key in keys if self._index.get(key)]
+
+    # Асинхронный метод для загрузки подписок из базы данных.
+    # Возвращает True, если загруженный индекс отличается от того, что был в памяти
+    async def load(self):
+        self._changes = []
+        try:
+            index = {}
+            async for rows in db.stream("SELECT source, category, user_id FROM subscriptions "
+                                        "ORDER BY source, category, user_id"):
+                for source, category, user_id in rows:
+                    index.setdefault((source, category), array('q')).append(user_id)
+            for subscribed, chat_id, source, category in self._changes:
+                if subscribed:
+                    _add(index.setdefault((source, category), array('q')), chat_id)
+                elif (source, category) in index:
+                    _discard(index[(source, category)], chat_id)
+        finally:
+            self._changes = None
+        # Темы без подписчиков не храним
+        index = {key: ids for key, ids in index.items() if ids}
+        changed = index != {key: ids for key, ids in self._index.items() if ids}
+        if changed:
+            logging.info("Подписки по темам загружены из базы данных: тем %d, подписок %d",
+                         len(index), sum(len(ids) for ids in index.values()))
+        self._index = index
+        return changed
+
+
+# Асинхронная функция для периодической сверки подписчиков в памяти с базой данных
+# (изменения из других процессов, ручные правки)
+async def reconcile_periodically(*collections, interval=SUBSCRIBERS_RECONCILE_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        for collection in collections:
+            try:
+                await collection.load()
+            except Exception:
+                logging.exception("Ошибка при сверке подписчиков с базой данных")
@@ -0,0 +1,26 @@
+import time
+from types import SimpleNamespace
+
+
+# Заменитель бота для тестов рассылки: записывает вызовы (метод, chat id, фотографии, время) и возвращает
+# сообщения с file_id загруженных фотографий. errors - {chat id: список исключений для очередных вызовов}
+class FakeBot:
+    def __init__(self, errors=None):
+        self.calls = []
+        self.errors = errors or {}
+
+    def _record(self, method, chat_id, photos):
+        self.calls.append((method, chat_id, photos, time.monotonic()))
+        if self.errors.get(chat_id):
+            raise self.errors[chat_id].pop(0)
+        return [SimpleNamespace(photo=[SimpleNamespace(file_id=f'file-{photo}')]) for photo in photos]
+
+    async def send_photo(self, chat_id, photo, caption=None, reply_markup=None):
+        return self._record('send_photo', chat_id, [photo])[0]
+
+    async def send_media_group(self, chat_id, media):
+        return self._record('send_media_group', chat_id, [item.media for item in media])
+
+    # Метод для получения вызовов метода method: список (chat id, фотографии)
+    def sent(self, method):
+        return [(chat_id, photos) for called, chat_id, photos, _ in self.calls if called == method]
@@ -0,0 +1,83 @@
+import time, unittest
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendPhoto
+
+from broadcast import Broadcaster, Notification
+from tests.fake_bot import FakeBot
+
+# Пауза, которую просит Telegram, и минимальный интервал между сообщениями в один чат в тестах
+RETRY_AFTER = 0.2
+CHAT_INTERVAL = 0.1
+
+
+def make_notifications(count):
+    return [Notification(photo=f'https://www.nur.kz/{number}.jpg', caption=f'Статья {number}', reply_markup=None,
+                         article_key=('nur', number))
+            for number in range(count)]
+
+
+class BroadcasterTest(unittest.IsolatedAsyncioTestCase):
+    async def broadcast(self, bot, chat_ids, notifications, **options):
+        options = {'workers': 2, 'rate': 1000, 'chat_interval': 0, 'stats_interval': 0, **options}
+        broadcaster = Broadcaster(bot, **options)
+        broadcaster.start()
+        try:
+            broadcaster.enqueue(chat_ids, notifications)
+            await broadcaster.join()
+        finally:
+            await broadcaster.stop()
+        return broadcaster
+
+    # Telegram просит подождать: вся рассылка приостанавливается, отправка повторяется
+    async def test_retry_after_pauses_and_retries(self):
+        error = TelegramRetryAfter(method=SendPhoto(chat_id=1, photo='x'), message='Too Many Requests',
+                                   retry_after=RETRY_AFTER)
+        bot = FakeBot(errors={1: [error]})
+        broadcaster = await self.broadcast(bot, [1, 2], make_notifications(1), workers=1)
+
+        self.assertEqual([chat_id for chat_id, _ in bot.sent('send_photo')], [1, 1, 2])
+        times = [moment for *_, moment in bot.calls]
+        self.assertGreaterEqual(times[1] - times[0], RETRY_AFTER * 0.9)
+        self.assertEqual(broadcaster.stats(), {'sent': 2, 'failed': 0, 'blocked': 0, 'backlog': 0})
+
+    # Пользователь, заблокировавший бота, отписывается один раз, остальные уведомления ему не отправляются
+    async def test_blocked_chat_is_unsubscribed_once(self):
+        unsubscribed = []
+
+        async def on_blocked(chat_id):
+            unsubscribed.append(chat_id)
+
+        error = TelegramForbiddenError(method=SendPhoto(chat_id=3, photo='x'),
+                                       message='Forbidden: bot was blocked by the user')
+        bot = FakeBot(errors={3: [error, error]})
+        broadcaster = await self.broadcast(bot, [1, 3], make_notifications(2), on_blocked=on_blocked)
+
+        self.assertEqual(unsubscribed, [3])
+        self.assertEqual([chat_id for chat_id, _ in bot.sent('send_photo')].count(3), 1)
+        self.assertEqual(broadcaster.stats(), {'sent': 2, 'failed': 0, 'blocked': 1, 'backlog': 0})
+
+    # Сообщения в один чат отправляются не чаще, чем раз в chat_interval
+    async def test_chat_interval(self):
+        bot = FakeBot()
+        start = time.monotonic()
+        await self.broadcast(bot, [1, 2], make_notifications(3), workers=4, chat_interval=CHAT_INTERVAL)
+
+        for chat_id in (1, 2):
+            times = [moment for _, called_chat, _, moment in bot.calls if called_chat == chat_id]
+            self.assertEqual(len(times), 3)
+            self.assertTrue(all(later - earlier >= CHAT_INTERVAL * 0.9 for earlier, later in zip(times, times[1:])))
+        # Разные чаты не ждут друг друга
+        self.assertLess(time.monotonic() - start, CHAT_INTERVAL * 5)
+
+    # Фотография загружается по ссылке один раз, остальные получатели получают её по file_id
+    async def test_photo_is_uploaded_once(self):
+        bot = FakeBot()
+        await self.broadcast(bot, [1, 2, 3], make_notifications(1), workers=3)
+
+        photos = [photo for _, (photo,) in bot.sent('send_photo')]
+        self.assertEqual(photos, ['https://www.nur.kz/0.jpg'] + ['file-https://www.nur.kz/0.jpg'] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
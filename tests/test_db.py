@@ -0,0 +1,95 @@
+import asyncio, contextlib, os, time, unittest
+
+import db
+
+# Время выполнения одного запроса в заменителе базы данных и количество одновременных пользователей
+QUERY_TIME = 0.1
+USERS = 10
+
+
+# Заменитель соединения: каждый запрос выполняется QUERY_TIME секунд, не блокируя цикл событий
+class FakeCursor:
+    async def fetchone(self):
+        return (1,)
+
+    async def fetchall(self):
+        return [(1,)]
+
+
+class FakeConnection:
+    async def execute(self, query, params=None, prepare=None):
+        await asyncio.sleep(QUERY_TIME)
+        return FakeCursor()
+
+
+# Заменитель пула: выдаёт не больше max_size соединений одновременно, как AsyncConnectionPool
+class FakePool:
+    def __init__(self, max_size):
+        self._slots = asyncio.Semaphore(max_size)
+        self.max_in_use = 0
+        self._in_use = 0
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        async with self._slots:
+            self._in_use += 1
+            self.max_in_use = max(self.max_in_use, self._in_use)
+            try:
+                yield FakeConnection()
+            finally:
+                self._in_use -= 1
+
+
+# Запросы одновременных пользователей выполняются параллельно на разных соединениях пула,
+# а не по очереди на одном общем соединении
+class ConcurrentQueriesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.real_pool = db.pool
+
+    async def asyncTearDown(self):
+        db.pool = self.real_pool
+
+    async def test_users_are_served_in_parallel(self):
+        db.pool = FakePool(max_size=USERS)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(db.fetchone("SELECT 1") for _ in range(USERS)))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, [(1,)] * USERS)
+        self.assertEqual(db.pool.max_in_use, USERS)
+        # По очереди запросы заняли бы USERS * QUERY_TIME
+        self.assertLess(elapsed, QUERY_TIME * 5)
+
+    async def test_pool_size_limits_parallel_queries(self):
+        db.pool = FakePool(max_size=USERS // 2)
+        start = time.perf_counter()
+        await asyncio.gather(*(db.execute("SELECT 1") for _ in range(USERS)))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(db.pool.max_in_use, USERS // 2)
+        # Две очереди по USERS // 2 запросов: быстрее, чем по одному, но не быстрее двух запросов подряд
+        self.assertGreaterEqual(elapsed, QUERY_TIME * 2)
+        self.assertLess(elapsed, QUERY_TIME * 8)
+
+
+# Та же проверка на настоящем PostgreSQL: запускается, если задана переменная окружения NEWSBOT_TEST_DSN
+@unittest.skipUnless(os.environ.get('NEWSBOT_TEST_DSN'), 'NEWSBOT_TEST_DSN не задана')
+class PostgresConcurrentQueriesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_users_are_served_in_parallel(self):
+        from psycopg_pool import AsyncConnectionPool
+
+        real_pool = db.pool
+        db.pool = AsyncConnectionPool(os.environ['NEWSBOT_TEST_DSN'], min_size=USERS, max_size=USERS, open=False)
+        try:
+            await db.open_pool()
+            start = time.perf_counter()
+            await asyncio.gather(*(db.fetchone("SELECT pg_sleep(%s)", (QUERY_TIME,)) for _ in range(USERS)))
+            elapsed = time.perf_counter() - start
+        finally:
+            await db.close_pool()
+            db.pool = real_pool
+        self.assertLess(elapsed, QUERY_TIME * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import html, re, unittest
+from types import SimpleNamespace
+
+from aiogram.types import InputMediaPhoto
+
+from broadcast import Broadcaster
+from digest import MEDIA_GROUP_LIMIT, MESSAGE_LIMIT, make_digests, telegram_length
+from tests.fake_bot import FakeBot
+
+
+def make_articles(count):
+    source = SimpleNamespace(name='nur', title='Nur')
+    return [(source, {'id': number, 'title': f'Статья {number}', 'link': f'https://www.nur.kz/{number}',
+                      'photo': f'https://www.nur.kz/{number}.jpg'}, None)
+            for number in range(count)]
+
+
+class MediaGroupDigestTest(unittest.IsolatedAsyncioTestCase):
+    # Длинная текстовая подборка делится на сообщения не длиннее ограничения Telegram (текст без разметки)
+    def test_text_digest_length_is_limited(self):
+        articles = make_articles(60)
+        for _, article, _ in articles:
+            article['title'] = f'Очень длинный заголовок статьи о событиях дня & {article["id"]} ' * 3
+        digests = make_digests(articles, 'text', max_items=100)
+        self.assertGreater(len(digests), 1)
+        lengths = [telegram_length(html.unescape(re.sub(r'<[^>]+>', '', digest.text))) for digest in digests]
+        self.assertTrue(all(length <= MESSAGE_LIMIT for length in lengths), lengths)
+        self.assertEqual(sum(digest.text.count('<a ') for digest in digests), len(articles))
+
+    def test_album_size_is_limited(self):
+        digests = make_digests(make_articles(25), 'media_group', max_items=25)
+        self.assertEqual([len(digest.media) for digest in digests], [10, 10, 5])
+        self.assertTrue(all(len(digest.media) <= MEDIA_GROUP_LIMIT for digest in digests))
+
+    # Фотографии альбома загружаются по ссылкам один раз, следующие получатели получают их по file_id
+    async def test_photos_are_uploaded_once(self):
+        uploaded = []
+
+        async def on_photo_uploaded(article_key, file_id):
+            uploaded.append((article_key, file_id))
+
+        bot = FakeBot()
+        broadcaster = Broadcaster(bot, on_photo_uploaded=on_photo_uploaded, workers=2, rate=1000,
+                                  chat_interval=0, stats_interval=0)
+        digest, = make_digests(make_articles(3), 'media_group')
+        broadcaster.start()
+        try:
+            broadcaster.enqueue([1, 2, 3], [digest])
+            await broadcaster.join()
+        finally:
+            await broadcaster.stop()
+
+        links = [f'https://www.nur.kz/{number}.jpg' for number in range(3)]
+        file_ids = [f'file-{link}' for link in links]
+        self.assertEqual([photos for _, photos in bot.sent('send_media_group')], [links, file_ids, file_ids])
+        self.assertEqual(uploaded, [(('nur', number), file_id) for number, file_id in enumerate(file_ids)])
+
+    # Сохранённые file_id статей используются сразу
+    def test_saved_file_ids_are_used(self):
+        articles = make_articles(2)
+        articles[0][1]['photo_file_id'] = 'saved'
+        digest, = make_digests(articles, 'media_group')
+        self.assertEqual([item.media for item in digest.media], ['saved', 'https://www.nur.kz/1.jpg'])
+        self.assertTrue(digest.needs_upload())
+        digest.reset_photo_file_ids()
+        self.assertEqual([item.media for item in digest.media], ['https://www.nur.kz/0.jpg', 'https://www.nur.kz/1.jpg'])
+        self.assertIsInstance(digest.media[0], InputMediaPhoto)
+
+
+if __name__ == '__main__':
+    unittest.main()
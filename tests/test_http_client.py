@@ -0,0 +1,70 @@
+import asyncio, time, unittest
+
+from aiohttp import web
+
+import http_client
+
+# Задержка ответа заглушки сайта и количество одновременно загружаемых страниц
+RESPONSE_DELAY = 0.3
+PAGES = 10
+
+
+# Асинхронная функция для замера задержки цикла событий: насколько позже запланированного просыпается задача
+async def probe_loop_lag(samples, interval=0.01):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+# Загрузка страниц через общий HTTP-клиент не должна блокировать цикл событий:
+# пока идут медленные запросы к сайту, обработчики бота отвечают без задержки
+class FetchResponsivenessTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def slow_page(request):
+            await asyncio.sleep(RESPONSE_DELAY)
+            return web.Response(text='<html><body>' + 'новость ' * 2000 + '</body></html>',
+                                content_type='text/html', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/{page}', slow_page)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+
+    async def asyncTearDown(self):
+        await http_client.close_session()
+        await self.runner.cleanup()
+
+    async def test_handlers_stay_responsive_during_scrape(self):
+        lag = []
+        probe = asyncio.create_task(probe_loop_lag(lag))
+
+        # Обработчик сообщения пользователя, вызываемый во время загрузки страниц
+        async def handler():
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        scrape = asyncio.create_task(http_client.gather_limited(
+            [http_client.fetch_bytes(f'{self.base_url}/{page}') for page in range(PAGES)], PAGES))
+        await asyncio.sleep(RESPONSE_DELAY / 2)
+        handler_time = await handler()
+        results = await scrape
+        elapsed = time.perf_counter() - start
+        probe.cancel()
+
+        for body, encoding in results:
+            self.assertIn('новость'.encode(encoding), body)
+        self.assertLess(handler_time, 0.05)
+        self.assertLess(max(lag), 0.05)
+        # Страницы загружаются одновременно, а не по очереди
+        self.assertLess(elapsed, RESPONSE_DELAY * PAGES / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
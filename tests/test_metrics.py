@@ -0,0 +1,46 @@
+import asyncio, unittest
+
+import metrics
+
+SOURCES = ['informburo', 'nur']
+
+
+# Асинхронная функция, имитирующая цикл парсинга: профилирование (если запрошено) и немного работы
+async def scrape_cycle(name, duration=0.01):
+    with metrics.profile_cycle(name) as profile:
+        await asyncio.sleep(duration)
+        sum(range(1000))
+    return profile.mode
+
+
+class ProfileCycleTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        metrics._profile_requests.clear()
+        metrics._profile_all_mode = None
+        metrics._profile_all_done.clear()
+
+    # Запрос без источника профилирует следующий цикл каждого источника по одному разу
+    async def test_request_for_all_sources_profiles_each_source_once(self):
+        metrics.request_profile(None, 'cpu')
+        profiled = [await scrape_cycle(name) for name in SOURCES]
+        self.assertEqual(profiled, ['cpu', 'cpu'])
+        profiled = [await scrape_cycle(name) for name in SOURCES]
+        self.assertEqual(profiled, [None, None])
+
+    async def test_request_for_one_source(self):
+        metrics.request_profile('nur', 'memory')
+        profiled = [await scrape_cycle(name) for name in SOURCES]
+        self.assertEqual(profiled, [None, 'memory'])
+
+    # Одновременные циклы не запускают второй профилировщик: источник профилируется в следующем цикле
+    async def test_overlapping_cycles_are_profiled_one_at_a_time(self):
+        metrics.request_profile(None, 'cpu')
+        profiled = await asyncio.gather(*(scrape_cycle(name) for name in SOURCES))
+        self.assertEqual(profiled, ['cpu', None])
+        profiled = await asyncio.gather(*(scrape_cycle(name) for name in SOURCES))
+        self.assertEqual(profiled, [None, 'cpu'])
+        self.assertFalse(metrics._profiling)
+
+
+if __name__ == '__main__':
+    unittest.main()
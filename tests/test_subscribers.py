@@ -0,0 +1,44 @@
+import unittest
+
+from digest import group_audiences
+from duplicates import DuplicateIndex, minhash
+from subscribers import SubscriberSet, SubscriptionIndex
+
+TEXT = ('Аким города открыл новый парк в центре Алматы, работы по благоустройству '
+        'продолжатся до конца года, сообщили в пресс-службе городского акимата')
+
+
+# Получатели повтора новости: первой её опубликовал Informburo (метка #общество), затем Nur (категория «Общество»)
+class DuplicateRecipientsTest(unittest.TestCase):
+    def setUp(self):
+        self.everyone = SubscriberSet()
+        self.everyone.add(1)
+        self.index = SubscriptionIndex()
+        self.index.add(2, 'informburo', '#общество')
+        self.index.add(3, 'nur', 'Общество')
+        self.index.add(4, 'informburo')
+        self.index.add(4, 'nur', 'Общество')
+        self.notified = ('informburo', '#общество')
+
+    # Ранняя статья найдена в индексе вместе с темой, по которой её получили подписчики
+    def test_index_returns_topic_of_earlier_article(self):
+        duplicates = DuplicateIndex(threshold=0.7)
+        duplicates.extend([('informburo', 10, minhash('Новый парк', TEXT), '#общество')])
+        self.assertEqual(duplicates.find(minhash('Новый парк в Алматы', TEXT)), ('informburo', 10, '#общество'))
+
+    # Подписчик только на категорию Nur получает повтор: ранняя статья Informburo ему не отправлялась
+    def test_nur_only_subscriber_gets_duplicate(self):
+        self.assertEqual(self.index.interested('nur', 'Общество', self.everyone, self.notified), [3])
+        self.assertEqual(self.index.interested('nur', 'Общество', self.everyone), [3, 4])
+
+    def test_digest_audiences_skip_notified_users(self):
+        duplicate = ('nur', 'Общество', self.notified)
+        audiences = group_audiences([('informburo', '#общество', None), duplicate], self.everyone, self.index)
+        self.assertEqual({topics: list(chat_ids) for topics, chat_ids in audiences.items()}, {
+            frozenset({('informburo', '#общество', None)}): [1, 2, 4],
+            frozenset({duplicate}): [3],
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()